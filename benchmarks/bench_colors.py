@@ -0,0 +1,138 @@
+"""Compare k-means dominant-color analysis with the histogram in rover_colors.
+
+Run from the repository root with pytest-benchmark:
+
+    python -m pytest benchmarks/bench_colors.py
+"""
+import colorsys
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rover_colors import analyze_colors
+
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+
+# BGR colors typical of indoor scenes
+PALETTE = {
+    "red": (40, 40, 200),
+    "yellow": (40, 200, 220),
+    "green": (60, 170, 60),
+    "cyan": (200, 200, 40),
+    "blue": (200, 80, 30),
+    "magenta": (180, 40, 180),
+    "white": (235, 235, 235),
+    "gray": (128, 128, 128),
+    "black": (15, 15, 15),
+}
+
+
+def make_frames(count: int = 20, seed: int = 0):
+    """Build frames made of a few large noisy color regions of random size"""
+    rng = np.random.default_rng(seed)
+    names = list(PALETTE)
+    frames = []
+    for _ in range(count):
+        frame = np.empty((FRAME_HEIGHT, FRAME_WIDTH, 3), dtype=np.uint8)
+        chosen = rng.choice(len(names), size=3, replace=False)
+        splits = np.sort(rng.choice(np.arange(80, FRAME_WIDTH - 80), size=2, replace=False))
+        edges = [0, *splits, FRAME_WIDTH]
+        for index, start, stop in zip(chosen, edges, edges[1:]):
+            frame[:, start:stop] = PALETTE[names[index]]
+        noise = rng.normal(0, 6, frame.shape)
+        frames.append(np.clip(frame + noise, 0, 255).astype(np.uint8))
+    return frames
+
+
+def get_color_name(hsv):
+    """The original RoverController._get_color_name"""
+    h, s, v = hsv
+    h *= 360
+
+    if s < 0.1:
+        if v < 0.2:
+            return "black"
+        elif v > 0.8:
+            return "white"
+        return "gray"
+
+    if h < 30:
+        return "red"
+    elif h < 90:
+        return "yellow"
+    elif h < 150:
+        return "green"
+    elif h < 210:
+        return "cyan"
+    elif h < 270:
+        return "blue"
+    elif h < 330:
+        return "magenta"
+    else:
+        return "red"
+
+
+def analyze_colors_kmeans(frame, num_colors=5):
+    """The original k-means analysis from RoverController._analyze_colors (BGR input)"""
+    from PIL import Image
+
+    img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    img = img.resize((150, 150))
+    pixels = np.float32(img).reshape(-1, 3)
+
+    criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 200, .1)
+    flags = cv2.KMEANS_RANDOM_CENTERS
+    _, labels, palette = cv2.kmeans(pixels, num_colors, None, criteria, 10, flags)
+
+    _, counts = np.unique(labels, return_counts=True)
+    percentages = counts / sum(counts)
+
+    colors = []
+    for color, percentage in zip(palette, percentages):
+        colors.append({
+            'name': get_color_name(colorsys.rgb_to_hsv(*(color / 255))),
+            'percentage': float(percentage)
+        })
+    colors.sort(key=lambda x: x['percentage'], reverse=True)
+    return colors
+
+
+def merged_shares(colors):
+    """Total share per color name (k-means can report the same name for several clusters)"""
+    shares = {}
+    for color in colors:
+        shares[color['name']] = shares.get(color['name'], 0.0) + color['percentage']
+    return shares
+
+
+@pytest.fixture(scope="module")
+def frames():
+    return make_frames()
+
+
+def test_histogram_agrees_with_kmeans(frames):
+    top_matches = 0
+    max_share_error = 0.0
+    for frame in frames:
+        expected = merged_shares(analyze_colors_kmeans(frame))
+        actual = merged_shares(analyze_colors(frame))
+        if max(expected, key=expected.get) == max(actual, key=actual.get):
+            top_matches += 1
+        for name in set(expected) | set(actual):
+            max_share_error = max(max_share_error, abs(expected.get(name, 0.0) - actual.get(name, 0.0)))
+
+    print(f"{len(frames)} frames: dominant color agrees on {top_matches}, "
+          f"largest share difference {max_share_error * 100:.1f} points")
+    assert top_matches >= len(frames) * 0.8
+
+
+@pytest.mark.benchmark(group="dominant colors, per frame")
+@pytest.mark.parametrize("analyze", [analyze_colors_kmeans, analyze_colors], ids=["kmeans", "histogram"])
+def test_analyze(benchmark, frames, analyze):
+    frame = frames[0]
+    benchmark(analyze, frame)
@@ -0,0 +1,110 @@
+"""Compare the deque-copy EventBuffer with the indexed ring buffer over 100k events.
+
+Run from the repository root with pytest-benchmark:
+
+    python -m pytest benchmarks/bench_event_buffer.py
+"""
+import os
+import sys
+from collections import deque
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rover_data import EventBuffer, RoverEvent
+
+NUM_EVENTS = 100_000
+EVENT_TYPES = ("STATUS", "CONTROL", "ANALYSIS", "WARNING", "ERROR")
+
+
+class DequeEventBuffer:
+    """The original EventBuffer: copy, reverse and slice the whole deque per page"""
+
+    def __init__(self, capacity: int = 500):
+        self.capacity = capacity
+        self.events: deque = deque(maxlen=capacity)
+
+    def add_event(self, event: RoverEvent):
+        self.events.append(event)
+
+    def get_events(self, start: int = 0, limit: int = 50):
+        events_list = list(self.events)
+        events_list.reverse()
+        end = min(start + limit, len(events_list))
+        return [event.to_dict() for event in events_list[start:end]]
+
+    def get_events_of_type(self, event_type: str, limit: int = 50):
+        # Filtering was not supported; the equivalent is a scan over the copy
+        matching = [event for event in reversed(self.events) if event.event_type == event_type]
+        return [event.to_dict() for event in matching[:limit]]
+
+
+def fill(buffer):
+    # ERROR events are rare, as on a healthy rover
+    for i in range(NUM_EVENTS):
+        event_type = "ERROR" if i % 1000 == 0 else EVENT_TYPES[i % 4]
+        buffer.add_event(RoverEvent(1, event_type, f"event {i}", float(i)))
+
+
+@pytest.fixture(scope="module")
+def old():
+    buffer = DequeEventBuffer(NUM_EVENTS)
+    fill(buffer)
+    return buffer
+
+
+@pytest.fixture(scope="module")
+def new():
+    buffer = EventBuffer(NUM_EVENTS)
+    fill(buffer)
+    return buffer
+
+
+def test_pages_match(old, new):
+    assert [e["message"] for e in old.get_events(0, 50)] == [e["message"] for e in new.get_events(0, 50)]
+    assert [e["message"] for e in old.get_events(5000, 50)] == [e["message"] for e in new.get_events(5000, 50)]
+
+
+@pytest.mark.benchmark(group="add")
+@pytest.mark.parametrize("buffer_class", [DequeEventBuffer, EventBuffer])
+def test_add(benchmark, buffer_class):
+    buffer = buffer_class(NUM_EVENTS)
+    event = RoverEvent(1, "STATUS", "event", 0.0)
+    benchmark(buffer.add_event, event)
+
+
+@pytest.mark.benchmark(group="first page")
+def test_deque_first_page(benchmark, old):
+    benchmark(old.get_events, 0, 50)
+
+
+@pytest.mark.benchmark(group="first page")
+def test_ring_first_page(benchmark, new):
+    benchmark(new.get_events, 0, 50)
+
+
+@pytest.mark.benchmark(group="page at offset 50k")
+def test_deque_page_at_offset(benchmark, old):
+    benchmark(old.get_events, 50_000, 50)
+
+
+@pytest.mark.benchmark(group="page at offset 50k")
+def test_ring_page_at_offset(benchmark, new):
+    benchmark(new.get_events, 50_000, 50)
+
+
+@pytest.mark.benchmark(group="page at offset 50k")
+def test_ring_page_by_before_cursor(benchmark, new):
+    cursor = new.get_page(limit=50)["next_before"]
+    benchmark(lambda: new.get_events(before=cursor, limit=50))
+
+
+@pytest.mark.benchmark(group="ERROR events")
+def test_deque_scan_for_errors(benchmark, old):
+    benchmark(old.get_events_of_type, "ERROR")
+
+
+@pytest.mark.benchmark(group="ERROR events")
+def test_ring_error_index(benchmark, new):
+    benchmark(lambda: new.get_events(event_type="ERROR"))
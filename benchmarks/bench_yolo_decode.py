@@ -0,0 +1,101 @@
+"""Compare the per-row YOLO decode loop with the vectorized decode_yolo_outputs.
+
+Run from the repository root with pytest-benchmark:
+
+    python -m pytest benchmarks/bench_yolo_decode.py
+"""
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from rover_detection import decode_yolo_outputs
+
+# YOLOv3 at 416x416 has three output layers of 13x13, 26x26 and 52x52 cells with 3 anchors each
+LAYER_ROWS = (13 * 13 * 3, 26 * 26 * 3, 52 * 52 * 3)
+NUM_CLASSES = 80
+FRAME_WIDTH, FRAME_HEIGHT = 640, 480
+
+
+def make_outputs(num_objects: int = 20, seed: int = 0):
+    """Build synthetic YOLO output tensors with a handful of confident detections"""
+    rng = np.random.default_rng(seed)
+    outs = []
+    for rows in LAYER_ROWS:
+        out = np.zeros((rows, 5 + NUM_CLASSES), dtype=np.float32)
+        out[:, :4] = rng.random((rows, 4), dtype=np.float32)
+        out[:, 4] = rng.random(rows, dtype=np.float32) * 0.1
+        # Background noise stays well under the confidence threshold
+        out[:, 5:] = rng.random((rows, NUM_CLASSES), dtype=np.float32) * 0.3
+        outs.append(out)
+
+    # Plant objects, each reported by a few neighbouring rows so NMS has work to do
+    for _ in range(num_objects):
+        layer = outs[rng.integers(len(outs))]
+        row = rng.integers(len(layer) - 3)
+        class_id = rng.integers(NUM_CLASSES)
+        box = rng.random(4, dtype=np.float32) * np.float32(0.5) + np.float32(0.1)
+        for offset in range(3):
+            layer[row + offset, :4] = box + rng.random(4, dtype=np.float32) * np.float32(0.01)
+            layer[row + offset, 5 + class_id] = 0.6 + rng.random() * 0.4
+    return outs
+
+
+def decode_loop(outs, width, height, conf_threshold=0.5, nms_threshold=0.4):
+    """The original per-row decode from RoverController.analyze_current_view"""
+    class_ids = []
+    confidences = []
+    boxes = []
+
+    for out in outs:
+        for detection in out:
+            scores = detection[5:]
+            class_id = np.argmax(scores)
+            confidence = scores[class_id]
+
+            if confidence > conf_threshold:
+                center_x = int(detection[0] * width)
+                center_y = int(detection[1] * height)
+                w = int(detection[2] * width)
+                h = int(detection[3] * height)
+                x = int(center_x - w / 2)
+                y = int(center_y - h / 2)
+
+                boxes.append([x, y, w, h])
+                confidences.append(float(confidence))
+                class_ids.append(class_id)
+
+    indexes = cv2.dnn.NMSBoxes(boxes, confidences, conf_threshold, nms_threshold)
+
+    kept = []
+    for i in range(len(boxes)):
+        if i in indexes:
+            kept.append((boxes[i], confidences[i], int(class_ids[i])))
+    return kept
+
+
+def decode_vectorized(outs, width, height, conf_threshold=0.5, nms_threshold=0.4):
+    boxes, confidences, class_ids = decode_yolo_outputs(outs, width, height, conf_threshold, nms_threshold)
+    return list(zip(boxes.tolist(), confidences.tolist(), class_ids.tolist()))
+
+
+@pytest.fixture(scope="module")
+def outs():
+    return make_outputs()
+
+
+def test_vectorized_matches_loop(outs):
+    expected = decode_loop(outs, FRAME_WIDTH, FRAME_HEIGHT)
+    actual = decode_vectorized(outs, FRAME_WIDTH, FRAME_HEIGHT)
+    assert [(b, c) for b, _, c in expected] == [(b, c) for b, _, c in actual], "decoded boxes differ"
+    assert np.allclose([conf for _, conf, _ in expected], [conf for _, conf, _ in actual]), "confidences differ"
+
+
+@pytest.mark.benchmark(group=f"decode {sum(LAYER_ROWS)} rows")
+@pytest.mark.parametrize("decode", [decode_loop, decode_vectorized], ids=["loop", "vectorized"])
+def test_decode(benchmark, outs, decode):
+    benchmark(decode, outs, FRAME_WIDTH, FRAME_HEIGHT)
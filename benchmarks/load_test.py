@@ -0,0 +1,279 @@
+"""End-to-end load test of the rover API against the simulator backend.
+
+Starts rover_server.py with ROVER_BACKEND=sim in a scratch directory (or
+targets an already running server with --url), drives each endpoint with
+concurrent async clients and reports latency percentiles, throughput and
+video frame delivery. Results can be saved as a baseline and later runs
+compared against it.
+
+Run from the repository root:
+
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --save-baseline benchmarks/baselines/sim.json
+    python benchmarks/load_test.py --compare benchmarks/baselines/sim.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from rover_stream import MJPEGParser
+
+# Request scenarios: name -> (method, path)
+SCENARIOS = {
+    "status": ("GET", "/api/status"),
+    "events": ("GET", "/api/events?limit=50"),
+    "telemetry": ("GET", "/api/telemetry?downsample=5"),
+    "snapshot": ("POST", "/api/snapshot"),
+    "analyze": ("POST", "/api/analyze"),
+    # Bypasses the change gate, so every request runs the whole detection pipeline
+    "analyze_full": ("POST", "/api/analyze?full=true"),
+}
+
+# Allowed change against a baseline before a metric counts as a regression;
+# run-to-run noise on a loaded dev box is around 30%
+REGRESSION_TOLERANCE = 0.5
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+async def run_requests(session, base_url, method, path, clients, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path) as response:
+                    body = await response.json()
+                    ok = response.status == 200 and (not isinstance(body, dict) or body.get("success", True))
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    return summarize(latencies, errors, time.perf_counter() - start)
+
+
+async def run_video(session, base_url, clients, duration, query=""):
+    """Each client reads /video_feed; report per-client frame rate and frame gaps"""
+    rates = []
+    gaps = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        parser = MJPEGParser()
+        frames = 0
+        last = None
+        start = time.perf_counter()
+        try:
+            timeout = aiohttp.ClientTimeout(total=duration + 10)
+            async with session.get(f"{base_url}/video_feed{query}", timeout=timeout) as response:
+                async for chunk in response.content.iter_chunked(16384):
+                    now = time.perf_counter()
+                    for _ in parser.feed(chunk):
+                        frames += 1
+                        if last is not None:
+                            gaps.append(now - last)
+                        last = now
+                    if now - start >= duration:
+                        break
+        except Exception:
+            errors += 1
+        rates.append(frames / max(time.perf_counter() - start, 1e-9))
+
+    await asyncio.gather(*(client() for _ in range(clients)))
+    gaps.sort()
+    return {
+        "clients": clients,
+        "errors": errors,
+        "fps_mean": round(sum(rates) / len(rates), 1) if rates else 0.0,
+        "fps_min": round(min(rates), 1) if rates else 0.0,
+        "gap_p50_ms": round(percentile(gaps, 0.50) * 1000, 2) if gaps else None,
+        "gap_p99_ms": round(percentile(gaps, 0.99) * 1000, 2) if gaps else None,
+    }
+
+
+async def wait_until_ready(session, base_url, timeout=60.0) -> dict:
+    """Wait for the server to answer and for vision to finish loading (or fail)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(base_url + "/api/status") as response:
+                if response.status == 200:
+                    status = await response.json()
+                    if status.get("vision_state") not in ("idle", "loading"):
+                        return status
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def start_server(port, stream_port):
+    """Run rover_server.py on the simulator in a scratch directory so the repo stays clean"""
+    workdir = tempfile.mkdtemp(prefix="rover-load-")
+    os.symlink(os.path.join(ROOT, "templates"), os.path.join(workdir, "templates"))
+    # Copied rather than linked: the static file server refuses paths that resolve outside its directory
+    shutil.copytree(os.path.join(ROOT, "static"), os.path.join(workdir, "static"), ignore=shutil.ignore_patterns("snapshots"))
+    os.makedirs(os.path.join(workdir, "static", "snapshots"))
+
+    env = dict(
+        os.environ,
+        ROVER_BACKEND="sim",
+        ROVER_SIM_SEED=os.environ.get("ROVER_SIM_SEED", "1"),
+        ROVER_SIM_STREAM_PORT=str(stream_port),
+        ROVER_VIDEO_URL=f"http://localhost:{stream_port}/mjpg",
+        ROVER_PORT=str(port),
+        PYTHONPATH=ROOT,
+    )
+    return subprocess.Popen(
+        [sys.executable, os.path.join(ROOT, "rover_server.py")],
+        cwd=workdir,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def run(args):
+    connector = aiohttp.TCPConnector(limit=0)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        status = await wait_until_ready(session, args.url)
+        # Give the camera a moment to start producing frames
+        await asyncio.sleep(1.0)
+
+        results = {}
+        for name in args.scenarios:
+            if name.startswith("analyze") and not status.get("vision_ready"):
+                # A real rover without model files would only time the error path
+                print(f"{name:>14}: skipped (vision is {status.get('vision_state')})")
+                continue
+            method, path = SCENARIOS[name]
+            results[name] = await run_requests(session, args.url, method, path, args.clients, args.duration)
+            print_result(name, results[name])
+
+        if args.video_clients:
+            results["video"] = await run_video(session, args.url, args.video_clients, args.duration)
+            print_result("video", results["video"])
+            results["video_reduced"] = await run_video(
+                session, args.url, args.video_clients, args.duration, "?fps=10&scale=0.5&quality=60"
+            )
+            print_result("video_reduced", results["video_reduced"])
+        return results
+
+
+def print_result(name, result):
+    fields = "  ".join(f"{key}={value}" for key, value in result.items())
+    print(f"{name:>14}: {fields}")
+
+
+def compare(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """Print changes against a baseline and return the regressed metrics"""
+    regressions = []
+    print("\nAgainst baseline:")
+    for name, metrics in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for key, value in metrics.items():
+            old = base.get(key)
+            if key in ("requests", "errors", "clients"):
+                continue
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old
+            # Latencies and gaps should not grow; rates should not shrink
+            higher_is_better = key.startswith(("throughput", "fps"))
+            worse = -change if higher_is_better else change
+            flag = "  REGRESSION" if worse > tolerance else ""
+            print(f"{name:>14}.{key:<14} {old:>10} -> {value:>10} ({change:+.0%}){flag}")
+            if flag:
+                regressions.append(f"{name}.{key}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--stream-port", type=int, default=9100)
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients per request scenario")
+    parser.add_argument("--video-clients", type=int, default=8, help="Concurrent /video_feed clients (0 to skip)")
+    parser.add_argument("--duration", type=float, default=5.0, help="Seconds per scenario")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--save-baseline", metavar="PATH", help="Write the results as a baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="Relative change that counts as a regression")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        args.url = f"http://localhost:{args.port}"
+        server = start_server(args.port, args.stream_port)
+    try:
+        results = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save_baseline)), exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump({
+                "machine": f"{platform.machine()} {platform.processor() or platform.system()}".strip(),
+                "python": platform.python_version(),
+                "settings": {
+                    "clients": args.clients,
+                    "video_clients": args.video_clients,
+                    "duration": args.duration,
+                },
+                "results": results,
+            }, f, indent=2)
+        print(f"\nBaseline written to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
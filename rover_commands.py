@@ -0,0 +1,163 @@
+import math
+import threading
+import time
+from typing import Optional
+
+
+class CommandChannel:
+    """Applies streamed manual commands to the rover, latest value wins.
+
+    Clients post commands here as fast as they like; each actuator (drive
+    and camera) keeps only its newest pending command, and a dedicated
+    thread applies it. Anything that arrives while the servos are being
+    written replaces the pending value instead of queueing behind it.
+
+    Continuous drive commands are covered by a dead-man timeout: if the
+    rover is moving and no drive command has arrived for deadman_timeout
+    seconds (a dropped connection or a stalled client), it is stopped.
+    Discrete commands ('forward', 'stop', ...) stay latched while the
+    client is alive; if nothing at all (commands or heartbeat()) arrives
+    for latch_timeout seconds, a latched movement is stopped as well.
+    """
+
+    def __init__(self, controller, deadman_timeout: float = 0.5, latch_timeout: float = 3.0):
+        self.controller = controller
+        self.deadman_timeout = deadman_timeout
+        self.latch_timeout = latch_timeout
+        self._condition = threading.Condition()
+        self._pending = {}  # actuator -> latest command not yet applied
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self._moving = False  # a continuous drive command with non-zero speed is in effect
+        self._last_drive = 0.0  # monotonic time of the last continuous drive command
+        self._latched = False  # a discrete movement other than 'stop' is in effect
+        self._last_seen = 0.0  # monotonic time the client was last heard from
+        self.received = 0
+        self.applied = 0
+        self.coalesced = 0
+        self.deadman_stops = 0
+        self.rtt_ms: Optional[float] = None  # smoothed client round trip
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="command-channel", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def drive(self, speed: float, steer: float):
+        """Continuous drive: speed in percent (negative reverses), steer in degrees"""
+        if not (math.isfinite(speed) and math.isfinite(steer)):
+            raise ValueError(f"speed and steer must be finite, got speed={speed} steer={steer}")
+        with self._condition:
+            self._last_drive = time.monotonic()
+            self._submit("drive", ("drive", speed, steer))
+
+    def move(self, command: str):
+        """Discrete movement command as accepted by handle_movement_command"""
+        with self._condition:
+            self._submit("drive", ("move", command))
+
+    def camera(self, pan: Optional[float], tilt: Optional[float]):
+        """Camera angles in degrees; None leaves that axis where it is"""
+        for angle in (pan, tilt):
+            if angle is not None and not math.isfinite(angle):
+                raise ValueError(f"pan and tilt must be finite, got pan={pan} tilt={tilt}")
+        with self._condition:
+            self._submit("camera", (None if pan is None else int(pan), None if tilt is None else int(tilt)))
+
+    def heartbeat(self):
+        """The client is still there (any message, including pongs)"""
+        with self._condition:
+            self._last_seen = time.monotonic()
+
+    def release(self):
+        """Stop any drive or latched movement immediately (e.g. the client disconnected)"""
+        with self._condition:
+            if self._moving or self._latched or "drive" in self._pending:
+                self._submit("drive", ("drive", 0, 0))
+
+    def record_rtt(self, rtt_ms: float):
+        if not math.isfinite(rtt_ms):
+            return
+        self.rtt_ms = rtt_ms if self.rtt_ms is None else 0.8 * self.rtt_ms + 0.2 * rtt_ms
+
+    def stats(self) -> dict:
+        return {
+            "rtt_ms": round(self.rtt_ms, 2) if self.rtt_ms is not None else None,
+            "received": self.received,
+            "applied": self.applied,
+            "coalesced": self.coalesced,
+            "deadman_stops": self.deadman_stops,
+            "deadman_timeout": self.deadman_timeout,
+            "latch_timeout": self.latch_timeout
+        }
+
+    def _submit(self, actuator: str, command):
+        # Caller holds the condition
+        self.received += 1
+        self._last_seen = time.monotonic()
+        if actuator in self._pending:
+            self.coalesced += 1
+        self._pending[actuator] = command
+        self._condition.notify()
+
+    def _apply(self, actuator: str, command):
+        if actuator == "camera":
+            self.controller.handle_camera_command(*command, log_event=False)
+        elif command[0] == "move":
+            moved = self.controller.handle_movement_command(command[1])
+            self._moving = False
+            self._latched = moved and command[1] != "stop"
+        else:
+            _, speed, steer = command
+            # Commands refused outside manual mode leave nothing for the dead-man to stop
+            self._moving = self.controller.handle_drive_command(speed, steer) and speed != 0
+            self._latched = False
+        self.applied += 1
+
+    def _deadman_deadline(self) -> Optional[float]:
+        """Monotonic time at which the current movement is stopped (None if stationary)"""
+        deadlines = []
+        if self._moving:
+            deadlines.append(self._last_drive + self.deadman_timeout)
+        if self._latched:
+            deadlines.append(self._last_seen + self.latch_timeout)
+        return min(deadlines) if deadlines else None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._running and not self._pending:
+                    timeout = self._deadman_deadline()
+                    if timeout is not None:
+                        timeout -= time.monotonic()
+                        if timeout <= 0:
+                            break
+                    self._condition.wait(timeout)
+                if not self._running:
+                    break
+                pending, self._pending = self._pending, {}
+                deadline = self._deadman_deadline()
+                deadman = "drive" not in pending and deadline is not None and time.monotonic() >= deadline
+
+            if deadman:
+                self.deadman_stops += 1
+                self._moving = self._latched = False
+                # Refused outside manual mode, where the control loop owns the motors
+                if self.controller.handle_drive_command(0, 0):
+                    self.controller.add_event("WARNING", "Drive stopped: no command within dead-man timeout")
+
+            for actuator, command in pending.items():
+                try:
+                    self._apply(actuator, command)
+                except Exception as e:
+                    print(f"Command error: {str(e)}")  # Console logging
@@ -1,16 +1,30 @@
-from picarx import Picarx
+from rover_hardware import Picarx, Vilib
 import time
 from datetime import datetime
-from rover_data import RoverStatus, RoverEvent, EventBuffer
+from rover_data import RoverStatus, RoverEvent, EventBuffer, TelemetryHistory
+from rover_eventlog import EventLog
+from rover_detection import (
+    DetectionWorker, DetectionJob, DetectorConfig, ChangeGate, CHANGE_GATE_DECISIONS, boxes_overlap, create_detector
+)
 from typing import Optional
 import threading
-from vilib import Vilib  # Import sunfounder's video library
 import base64
 import cv2
-import os
 import numpy as np
-from PIL import Image
-import colorsys
+import os
+from rover_colors import analyze_colors
+from rover_sensors import SensorSampler
+from rover_snapshots import SnapshotStore
+from rover_frames import FrameStore, ImageCache
+from rover_scheduler import ControlLoop
+from rover_navigation import detection_obstacles, steer_away
+from concurrent.futures import Future
+import rover_metrics
+
+ANALYSIS_SECONDS = rover_metrics.histogram("rover_analysis_seconds", "End-to-end duration of an image analysis")
+ANALYSIS_STAGE_SECONDS = rover_metrics.histogram(
+    "rover_analysis_stage_seconds", "Time spent in each stage of image analysis", ("stage",)
+)
 
 class Constants:
     # Drive settings
@@ -19,55 +33,131 @@ class Constants:
     MOVE_SPEED = 15
     BACKUP_SPEED = 7
     TURN_ANGLE = 30  # degrees
+    MAX_MANUAL_SPEED = 50  # limit for continuous manual driving
+    MAX_STEER_ANGLE = 30  # degrees
+    COMMAND_DEADMAN_TIMEOUT = 0.5  # seconds without a drive command before stopping
+    COMMAND_LATCH_TIMEOUT = 3.0  # seconds without hearing from the client before a latched move stops
     
     # Camera settings
     CAMERA_DEFAULT_ANGLE = 0
     
+    # Detection settings
+    DETECTION_QUEUE_SIZE = 4
+    DETECTION_STREAM_INTERVAL = 1.0  # seconds between streamed detections
+    AUTONOMOUS_VISION_INTERVAL = 0.5  # detection rate while driving autonomously
+    VISION_MAX_AGE = 1.5  # seconds before a detection is too stale to steer by
+    VISION_OBSTACLE_MIN_HEIGHT = 0.2  # box height as a fraction of the frame
+    CHANGE_GATE_ENABLED = os.environ.get("ROVER_CHANGE_GATE", "1") != "0"  # skip inference on unchanged frames
+    CHANGE_GATE_MAX_AGE = 10.0  # seconds between forced full-frame detections
+    
     # Timing settings
     STATUS_UPDATE_INTERVAL = 0.5
-    AUTONOMOUS_DRIVE_INTERVAL = 0.25
+    TELEMETRY_INTERVAL = 0.5
+    DISTANCE_SAMPLE_INTERVAL = 0.05  # 20Hz ultrasonic sampling
+    DISTANCE_MEDIAN_WINDOW = 3
+    
+    # Event settings
+    EVENT_BUFFER_CAPACITY = int(os.environ.get("ROVER_EVENT_CAPACITY", 500))
+    EVENT_LOG_DIR = "data/events"
+    TELEMETRY_HISTORY_CAPACITY = 7200  # one hour of samples at STATUS_UPDATE_INTERVAL
+    CONTROL_LOOP_RATE = float(os.environ.get("ROVER_CONTROL_RATE", 50))  # Hz
     BACKUP_STEP_DELAY = 0.25
     BACKUP_STEPS = 3
 
 class RoverController:
-    _instance = None
-    _initialized = False
+    _instance = None  # the process's default controller, see get_instance()
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(RoverController, cls).__new__(cls)
-        return cls._instance
-
-    def __init__(self, rover_id: int = 1, rover_name: str = "rover_1"):
-        # Only initialize once
-        if not RoverController._initialized:
-            self.px = Picarx()
-            self.event_buffer = EventBuffer()
-            self.running = True
-            self.mode = "manual"
-            self.rover_id = rover_id
-            self.rover_name = rover_name
-            self.battery = 100  # Mock battery level
-            
-            # Initialize camera and servos
-            self.px.set_dir_servo_angle(Constants.CAMERA_DEFAULT_ANGLE)
-            self.px.set_cam_pan_angle(Constants.CAMERA_DEFAULT_ANGLE)
-            self.px.set_cam_tilt_angle(Constants.CAMERA_DEFAULT_ANGLE)
-            
-            self.add_event("STATUS", "Camera streaming started on port 9000")
-            
-            self._shutdown_event = threading.Event()
-            self._threads = []
-            
-            # Create snapshots directory if it doesn't exist
-            self.snapshots_dir = "static/snapshots"
-            os.makedirs(self.snapshots_dir, exist_ok=True)
-            self.max_snapshots = 10  # Keep last 10 snapshots
-            
-            RoverController._initialized = True
+    def __init__(
+        self,
+        rover_id: int = 1,
+        rover_name: str = "rover_1",
+        event_log_dir: str = Constants.EVENT_LOG_DIR,
+        snapshots_dir: str = "static/snapshots"
+    ):
+        self.px = Picarx()
+        # Every event is also persisted; sequence ids continue from the log across restarts
+        self.event_log = EventLog(event_log_dir)
+        self.event_log.open()
+        self.event_buffer = EventBuffer(Constants.EVENT_BUFFER_CAPACITY, first_seq=self.event_log.next_seq)
+        
+        # Telemetry subscribers and the events they have not been sent yet
+        self._telemetry_listeners = []
+        self._telemetry_lock = threading.Lock()
+        self._pending_telemetry_events = []
+        self.latest_telemetry = None  # last full status sampled by the telemetry loop
+        self.telemetry_history = TelemetryHistory(Constants.TELEMETRY_HISTORY_CAPACITY)
+        
+        self.running = True
+        self.mode = "manual"
+        self.rover_id = rover_id
+        self.rover_name = rover_name
+        self.battery = 100  # Mock battery level
+        
+        # Initialize camera and servos
+        self.px.set_dir_servo_angle(Constants.CAMERA_DEFAULT_ANGLE)
+        self.px.set_cam_pan_angle(Constants.CAMERA_DEFAULT_ANGLE)
+        self.px.set_cam_tilt_angle(Constants.CAMERA_DEFAULT_ANGLE)
+        
+        self.add_event("STATUS", "Camera streaming started on port 9000")
+        
+        # All ultrasonic reads happen on the sampler thread; everyone else reads its cache
+        self.distance_sampler = SensorSampler(
+            self.px.ultrasonic.read,
+            interval=Constants.DISTANCE_SAMPLE_INTERVAL,
+            median_window=Constants.DISTANCE_MEDIAN_WINDOW,
+            name="ultrasonic"
+        )
+        self.distance_sampler.start()
+        
+        self._shutdown_event = threading.Event()
+        self._threads = []
+        
+        # Autonomous driving runs on a deadline-scheduled loop that also wakes on every new distance sample
+        self.drive_state = "idle"  # idle -> cruise <-> backup, or blind without a distance reading
+        self._backup_until = 0.0
+        self._drive_command = None  # last (steering, speed) sent to the motors
+        self._control_sample_seq = 0
+        self._vision_steering_cache = (None, None)  # (detection, steering angle)
+        self._autonomous_vision = False  # detection stream started by autonomous mode
+        self.control_loop = ControlLoop(
+            self._autonomous_step,
+            rate=Constants.CONTROL_LOOP_RATE,
+            wait_fn=self._wait_for_distance,
+            name="autonomous"
+        )
+        
+        # Latest camera frame with a shared JPEG encoding, and annotated analysis images
+        self.frames = FrameStore(lambda: Vilib.img)
+        self.analysis_images = ImageCache()
+        
+        # Snapshots are encoded and written on their own thread
+        self.snapshots_dir = snapshots_dir
+        self.max_snapshots = 10  # Keep last 10 snapshots
+        self.snapshots = SnapshotStore(self.snapshots_dir, self.max_snapshots, on_event=self.add_event)
+        self.snapshots.start()
+        
+        self.detector = None
+        self.detection_worker = None
+        # Skips or narrows inference when consecutive analyzed frames barely differ
+        self.change_gate = ChangeGate(max_age=Constants.CHANGE_GATE_MAX_AGE) if Constants.CHANGE_GATE_ENABLED else None
+        self.vision_state = "idle"  # idle -> loading -> ready | error
+        self._vision_thread = None
+        
+        # Most recent analysis result, shared by on-demand and streaming detection
+        self._latest_detection = None
+        self._latest_detection_lock = threading.Lock()
+        self._detection_stream_thread = None
+        self._detection_stream_stop = threading.Event()
+        self.detection_stream_interval = Constants.DETECTION_STREAM_INTERVAL
+        
 
     @classmethod
     def get_instance(cls, *args, **kwargs):
+        """The default controller for this process's rover, created on first use
+
+        Further controllers (e.g. additional simulated rovers) can be
+        constructed directly and registered with a fleet.
+        """
         if not cls._instance:
             cls._instance = cls(*args, **kwargs)
         return cls._instance
@@ -78,23 +168,31 @@ class RoverController:
             rover_id=self.rover_id,
             rover_name=self.rover_name,
             battery=self.battery,
-            distance=self.px.ultrasonic.read(),
+            distance=self.get_distance(),
             mode=self.mode,
             timestamp=datetime.now().timestamp(),
             camera_pan=self.px.cam_pan.angle,
-            camera_tilt=self.px.cam_tilt.angle
+            camera_tilt=self.px.cam_tilt.angle,
+            vision_state=self.vision_state
         )
         # Convert to dict to avoid serialization issues
-        return {
-            "rover_id": status.rover_id,
-            "rover_name": status.rover_name,
-            "battery": status.battery,
-            "distance": status.distance,
-            "mode": status.mode,
-            "timestamp": status.timestamp,
-            "camera_pan": status.camera_pan,
-            "camera_tilt": status.camera_tilt
-        }
+        return {**status.to_dict(), "vision_ready": status.vision_state == "ready"}
+    
+    def record_telemetry(self):
+        """Append the current status to the telemetry history"""
+        self.telemetry_history.record(
+            time.time(),
+            self.get_distance(),
+            self.battery,
+            self.px.cam_pan.angle,
+            self.px.cam_tilt.angle,
+            self.mode
+        )
+    
+    def get_distance(self) -> float:
+        """Latest median-filtered ultrasonic distance in cm (-1 if there is no valid reading)"""
+        distance = self.distance_sampler.filtered()
+        return -1 if distance is None else round(distance, 2)
     
     def add_event(self, event_type: str, message: str):
         """Add a new event to the buffer"""
@@ -105,6 +203,55 @@ class RoverController:
             timestamp=datetime.now().timestamp()
         )
         self.event_buffer.add_event(event)
+        self.event_log.append(event)
+        with self._telemetry_lock:
+            if self._telemetry_listeners:
+                self._pending_telemetry_events.append(event.to_dict())
+    
+    def add_telemetry_listener(self, listener):
+        """Register a callable that receives each telemetry message (called on the sampler thread)"""
+        with self._telemetry_lock:
+            self._telemetry_listeners.append(listener)
+    
+    def remove_telemetry_listener(self, listener):
+        with self._telemetry_lock:
+            if listener in self._telemetry_listeners:
+                self._telemetry_listeners.remove(listener)
+            if not self._telemetry_listeners:
+                self._pending_telemetry_events.clear()
+    
+    def telemetry_loop(self):
+        """Sample status once per tick and push status deltas and new events to listeners"""
+        previous = {}
+        while not self._shutdown_event.is_set():
+            with self._telemetry_lock:
+                listeners = list(self._telemetry_listeners)
+            
+            if listeners:
+                try:
+                    status = self.get_status()
+                    self.latest_telemetry = status
+                    
+                    with self._telemetry_lock:
+                        events = self._pending_telemetry_events
+                        self._pending_telemetry_events = []
+                    
+                    message = {
+                        "type": "telemetry",
+                        "status": {key: value for key, value in status.items() if previous.get(key) != value},
+                        "events": events
+                    }
+                    previous = status
+                    
+                    for listener in listeners:
+                        listener(message)
+                except Exception as e:
+                    print(f"Telemetry error: {str(e)}")  # Console logging
+            else:
+                # Send a full status to the next listener that connects
+                previous = {}
+            
+            self._shutdown_event.wait(Constants.TELEMETRY_INTERVAL)
     
     def handle_movement_command(self, command: str):
         """Handle manual movement commands"""
@@ -129,13 +276,28 @@ class RoverController:
         self.add_event("CONTROL", f"Manual command executed: {command}")
         return True
     
-    def handle_camera_command(self, pan: Optional[int] = None, tilt: Optional[int] = None):
+    def handle_drive_command(self, speed: float, steer: float) -> bool:
+        """Handle continuous manual driving (speed in percent, negative reverses; steer in degrees)"""
+        if self.mode != "manual":
+            return False
+        
+        speed = int(round(max(-Constants.MAX_MANUAL_SPEED, min(Constants.MAX_MANUAL_SPEED, speed))))
+        steer = int(round(max(-Constants.MAX_STEER_ANGLE, min(Constants.MAX_STEER_ANGLE, steer))))
+        self.px.set_dir_servo_angle(steer)
+        if speed >= 0:
+            self.px.forward(speed)
+        else:
+            self.px.backward(-speed)
+        return True
+    
+    def handle_camera_command(self, pan: Optional[int] = None, tilt: Optional[int] = None, log_event: bool = True):
         """Handle camera movement commands"""
         if pan is not None:
             self.px.set_cam_pan_angle(pan)
         if tilt is not None:
             self.px.set_cam_tilt_angle(tilt)
-        self.add_event("CONTROL", f"Camera adjusted to pan:{pan} tilt:{tilt}")
+        if log_event:
+            self.add_event("CONTROL", f"Camera adjusted to pan:{pan} tilt:{tilt}")
         return True
     
     def set_mode(self, new_mode: str):
@@ -149,45 +311,117 @@ class RoverController:
             self.px.set_dir_servo_angle(0)
             
         self.add_event("STATUS", f"Mode changed to {new_mode}")
+        self._sync_autonomous_vision()
         return True
     
-    def autonomous_drive(self):
-        """Autonomous driving logic"""
-        while not self._shutdown_event.is_set():
-            if self.mode == "autonomous":
-                distance = round(self.px.ultrasonic.read(), 2)
-                
-                if distance >= Constants.SAFE_DISTANCE:
-                    self.px.set_dir_servo_angle(0)
-                    self.px.forward(Constants.MOVE_SPEED)
-                    
-                elif distance >= Constants.DANGER_DISTANCE:
-                    self.px.set_dir_servo_angle(Constants.TURN_ANGLE)
-                    self.px.forward(Constants.MOVE_SPEED)
-                    
-                else:
-                    self.add_event("WARNING", f"Obstacle detected at {distance}cm")
-                    self.px.set_dir_servo_angle(-Constants.TURN_ANGLE)
-                    for _ in range(Constants.BACKUP_STEPS):
-                        if self._shutdown_event.is_set():
-                            break
-                        self.px.backward(Constants.BACKUP_SPEED)
-                        time.sleep(Constants.BACKUP_STEP_DELAY)
-                    self.px.forward(Constants.MOVE_SPEED)
-                
-            time.sleep(Constants.AUTONOMOUS_DRIVE_INTERVAL)
+    def _sync_autonomous_vision(self):
+        """Run the detection stream while driving autonomously so the drive loop can steer by it"""
+        if self.mode == "autonomous":
+            if self.vision_ready and not self.detection_stream_active:
+                self._autonomous_vision = self.start_detection_stream(Constants.AUTONOMOUS_VISION_INTERVAL)
+        elif self._autonomous_vision:
+            self._autonomous_vision = False
+            self.stop_detection_stream()
+    
+    def _vision_steering(self) -> Optional[int]:
+        """Steering angle away from obstacles in the latest detection (None if clear or stale)"""
+        with self._latest_detection_lock:
+            detection = self._latest_detection
+        if detection is None or not detection.get('success'):
+            return None
+        if time.time() - detection['timestamp'] > Constants.VISION_MAX_AGE:
+            return None
+        
+        # Detections arrive far slower than the control loop ticks, so reuse the last answer
+        cached_detection, angle = self._vision_steering_cache
+        if detection is not cached_detection:
+            obstacles = detection_obstacles(
+                detection['objects'],
+                detection['frame_size'],
+                min_height=Constants.VISION_OBSTACLE_MIN_HEIGHT
+            )
+            angle = steer_away(obstacles, Constants.TURN_ANGLE)
+            angle = None if angle is None else int(round(angle))
+            self._vision_steering_cache = (detection, angle)
+        return angle
+    
+    def _wait_for_distance(self, timeout: float) -> bool:
+        """Control loop wait: True as soon as a new distance sample arrives"""
+        if self.distance_sampler.wait_for_sample(self._control_sample_seq, timeout):
+            self._control_sample_seq = self.distance_sampler.seq
+            return True
+        return False
+    
+    def _drive(self, steering: int, speed: int):
+        """Send a drive command, skipping the motor writes if nothing changed"""
+        command = (steering, speed)
+        if command == self._drive_command:
+            return
+        self._drive_command = command
+        self.px.set_dir_servo_angle(steering)
+        if speed >= 0:
+            self.px.forward(speed)
+        else:
+            self.px.backward(-speed)
+    
+    def _autonomous_step(self, now: float):
+        """One control loop tick of autonomous driving (control loop thread)"""
+        if self.mode != "autonomous":
+            # Manual commands drive the motors directly, so forget what was last sent
+            self.drive_state = "idle"
+            self._drive_command = None
+            return
+        
+        if self.drive_state == "backup":
+            if now < self._backup_until:
+                return
+            # Backup finished; pull away forward keeping the escape steering
+            self.drive_state = "cruise"
+            self._drive(-Constants.TURN_ANGLE, Constants.MOVE_SPEED)
+            return
+        
+        distance = self.get_distance()
+        if distance < 0:
+            # No fresh ultrasonic reading: stop rather than drive on stale data
+            if self.drive_state != "blind":
+                self.add_event("WARNING", "No distance reading, stopping")
+            self.drive_state = "blind"
+            self._drive(0, 0)
+            return
+        
+        self.drive_state = "cruise"
+        # The camera sees obstacles beyond ultrasonic range and off to the sides
+        vision_angle = self._vision_steering()
+        
+        if distance >= Constants.SAFE_DISTANCE:
+            self._drive(vision_angle or 0, Constants.MOVE_SPEED)
+            
+        elif distance >= Constants.DANGER_DISTANCE:
+            # Turn hard, towards whichever side vision says is clear
+            if vision_angle is not None and vision_angle < 0:
+                self._drive(-Constants.TURN_ANGLE, Constants.MOVE_SPEED)
+            else:
+                self._drive(Constants.TURN_ANGLE, Constants.MOVE_SPEED)
+            
+        else:
+            self.add_event("WARNING", f"Obstacle detected at {distance}cm")
+            self._drive(-Constants.TURN_ANGLE, -Constants.BACKUP_SPEED)
+            self.drive_state = "backup"
+            self._backup_until = now + Constants.BACKUP_STEPS * Constants.BACKUP_STEP_DELAY
     
     def start(self):
         """Start the rover controller"""
         self._shutdown_event.clear()
-        autonomous_thread = threading.Thread(target=self.autonomous_drive, daemon=True)
-        autonomous_thread.start()
-        self._threads.append(autonomous_thread)
+        self.control_loop.start()
+        telemetry_thread = threading.Thread(target=self.telemetry_loop, daemon=True)
+        telemetry_thread.start()
+        self._threads.append(telemetry_thread)
         
         try:
             while not self._shutdown_event.is_set():
                 # Simulate battery drain
                 self.battery = max(0, self.battery - 0.1)
+                self.record_telemetry()
                 time.sleep(Constants.STATUS_UPDATE_INTERVAL)
         except KeyboardInterrupt:
             self.cleanup()
@@ -195,6 +429,8 @@ class RoverController:
     def cleanup(self):
         """Clean up resources"""
         self._shutdown_event.set()
+        self.control_loop.stop()
+        self.distance_sampler.stop()
         self.px.forward(0)  # Stop movement
         self.px.set_dir_servo_angle(0)  # Center steering
         self.px.set_cam_pan_angle(0)  # Center camera
@@ -204,161 +440,264 @@ class RoverController:
         for thread in self._threads:
             thread.join(timeout=1.0)
             
+        self.stop_detection_stream()
+        if self.detection_worker is not None:
+            self.detection_worker.stop()
+            
+        self.snapshots.stop()
         Vilib.camera_close()
+        self.event_log.close()
+    
+    def capture_snapshot(self) -> Future:
+        """Queue the current frame to be saved; the future resolves with the snapshot info"""
+        frame = self.frames.latest_encoded()
+        if frame is None:
+            self.add_event("ERROR", "Failed to take snapshot: No frame available")
+        return self.snapshots.capture(frame)
     
     def take_snapshot(self) -> dict:
         """Take a snapshot and save it"""
-        try:
-            # Get frame from vilib
-            frame = Vilib.img
-            if frame is None:
-                self.add_event("ERROR", "Failed to take snapshot: No frame available")
-                return {"success": False, "error": "No frame available"}
-                
-            # Generate filename with timestamp
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"snapshot_{timestamp}.jpg"
-            filepath = os.path.join(self.snapshots_dir, filename)
-            
-            self.add_event("STATUS", f"Saving snapshot to {filepath}")
-            
-            # Save the image
-            cv2.imwrite(filepath, frame)
-            
-            # Keep only the last N snapshots
-            snapshots = sorted([f for f in os.listdir(self.snapshots_dir) if f.startswith("snapshot_")])
-            if len(snapshots) > self.max_snapshots:
-                for old_file in snapshots[:-self.max_snapshots]:
-                    old_path = os.path.join(self.snapshots_dir, old_file)
-                    self.add_event("STATUS", f"Removing old snapshot: {old_file}")
-                    os.remove(old_path)
-            
-            self.add_event("STATUS", f"Snapshot taken: {filename}")
-            return {
-                "success": True,
-                "filename": filename,
-                "timestamp": timestamp
-            }
-        except Exception as e:
-            error_msg = f"Failed to take snapshot: {str(e)}"
-            self.add_event("ERROR", error_msg)
-            print(f"Snapshot error: {error_msg}")  # Console logging
-            return {"success": False, "error": str(e)}
+        return self.capture_snapshot().result()
     
     def get_snapshots(self) -> list:
         """Get list of available snapshots"""
+        return self.snapshots.list()
+
+    def start_vision_warmup(self, detector_config: Optional[DetectorConfig] = None):
+        """Initialize vision on a background thread so startup is not blocked by model loading"""
+        if self._vision_thread is not None:
+            return
+        self.vision_state = "loading"
+        self._vision_thread = threading.Thread(
+            target=self._warm_up_vision,
+            args=(detector_config,),
+            daemon=True
+        )
+        self._vision_thread.start()
+
+    def _warm_up_vision(self, detector_config: Optional[DetectorConfig]):
         try:
-            snapshots = sorted([f for f in os.listdir(self.snapshots_dir) if f.startswith("snapshot_")])
-            return [{
-                "filename": f,
-                "timestamp": datetime.strptime(f[9:-4], "%Y%m%d_%H%M%S").isoformat()
-            } for f in snapshots]
+            started = time.time()
+            self.initialize_vision(detector_config)
+            self.add_event("STATUS", f"Vision ready after {time.time() - started:.1f}s")
         except Exception as e:
-            self.add_event("ERROR", f"Failed to list snapshots: {str(e)}")
-            return []
+            self.vision_state = "error"
+            print(f"Vision initialization error: {str(e)}")  # Console logging
+            self.add_event("ERROR", f"Vision initialization failed: {str(e)}")
 
-    def initialize_vision(self):
-        """Initialize vision capabilities"""
+    @property
+    def vision_ready(self) -> bool:
+        return self.vision_state == "ready"
+
+    def initialize_vision(self, detector_config: Optional[DetectorConfig] = None):
+        """Initialize vision capabilities
+
+        The detector model defaults to the ROVER_DETECTOR_* environment settings.
+        """
+        self.vision_state = "loading"
         Vilib.camera_start(vflip=False, hflip=True)
         Vilib.display(local=True, web=True)
         
-        # Load YOLO model
-        self.net = cv2.dnn.readNet(
-            "yolov3.weights",
-            "yolov3.cfg"
+        # Load the object detection model
+        self.detector = create_detector(detector_config)
+        self.detector.load()
+        self.classes = self.detector.classes
+        if self.change_gate is not None:
+            # Results from a previous detector must not be carried over
+            self.change_gate.reset()
+        self.add_event(
+            "STATUS",
+            f"Detector {self.detector.config.model} loaded at "
+            f"{self.detector.input_size[0]}x{self.detector.input_size[1]}"
         )
         
-        # Load class names
-        with open("coco.names", "r") as f:
-            self.classes = [line.strip() for line in f.readlines()]
+        # Pay the first-inference allocation cost now rather than on the first request
+        self.detector.warm_up()
         
-        # Get output layer names
-        self.layer_names = self.net.getLayerNames()
-        self.output_layers = [self.layer_names[i - 1] for i in self.net.getUnconnectedOutLayers()]
+        # The detection worker thread is the only user of the detector from here on
+        self.detection_worker = DetectionWorker(
+            self._run_analysis,
+            max_pending=Constants.DETECTION_QUEUE_SIZE
+        )
+        self.detection_worker.start()
+        self.vision_state = "ready"
+        self._sync_autonomous_vision()
+
+    def submit_analysis(self, full: bool = False) -> DetectionJob:
+        """Queue the current camera view for analysis without waiting for the result
+
+        full skips the change gate and always runs detection on the whole frame.
+        """
+        if not self.vision_ready:
+            raise RuntimeError(f"Vision is not ready (state: {self.vision_state})")
+        frame = self.frames.latest()
+        if frame is None:
+            return self.detection_worker.submit(None)
+        return self.detection_worker.submit(frame.image, frame_seq=frame.seq, full=full)
+
+    def start_detection_stream(self, interval: Optional[float] = None) -> bool:
+        """Continuously analyze camera frames in the background"""
+        if not self.vision_ready:
+            self.add_event("ERROR", f"Detection stream not started - vision is {self.vision_state}")
+            return False
+        if interval is not None:
+            if interval <= 0:
+                return False
+            self.detection_stream_interval = interval
+        if self.detection_stream_active:
+            return True
+            
+        # Each stream gets its own stop event, so one that is still winding down can't be revived
+        self._detection_stream_stop = threading.Event()
+        self._detection_stream_thread = threading.Thread(
+            target=self._detection_stream_loop, args=(self._detection_stream_stop,), daemon=True
+        )
+        self._detection_stream_thread.start()
+        self.add_event("STATUS", f"Detection stream started every {self.detection_stream_interval}s")
+        return True
+
+    def stop_detection_stream(self):
+        """Stop background detection
+
+        Only signals the stream thread, which exits at its next wake-up, so
+        this never blocks the caller (often the server's event loop).
+        """
+        if not self.detection_stream_active:
+            return
+        self._detection_stream_stop.set()
+        self._detection_stream_thread = None
+        self.add_event("STATUS", "Detection stream stopped")
+
+    @property
+    def detection_stream_active(self) -> bool:
+        return self._detection_stream_thread is not None and self._detection_stream_thread.is_alive()
+
+    def _detection_stream_loop(self, stop_event: threading.Event):
+        """Feed the latest camera frame to the detection worker whenever it is idle"""
+        last_seq = 0
+        while not stop_event.is_set() and not self._shutdown_event.is_set():
+            frame = self.frames.latest()
+            # Drop frames while the model is busy and never analyze the same frame twice
+            if frame is not None and frame.seq != last_seq and not self.detection_worker.busy:
+                self.detection_worker.submit(frame.image, log_events=False, frame_seq=frame.seq)
+                last_seq = frame.seq
+            stop_event.wait(self.detection_stream_interval)
+
+    def get_latest_detection(self) -> Optional[dict]:
+        """Get the most recent analysis result without running a new one"""
+        with self._latest_detection_lock:
+            if self._latest_detection is None:
+                return None
+            return dict(self._latest_detection)
+
+    def _publish_detection(self, result: dict):
+        timestamp = datetime.now().timestamp()
+        with self._latest_detection_lock:
+            self._latest_detection = {**result, 'timestamp': timestamp}
 
     def analyze_current_view(self):
         """Analyze the current camera view for objects and colors"""
         try:
-            # Capture current frame using Vilib.img
-            frame = Vilib.img
-            if frame is None:
-                return {'success': False, 'error': 'Failed to capture frame'}
+            return self.submit_analysis().future.result()
+        except Exception as e:
+            self.add_event("ERROR", f"Analysis failed: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e)
+            }
 
+    @rover_metrics.timed(ANALYSIS_SECONDS)
+    def _run_analysis(self, frame, log_events: bool = True, frame_seq: Optional[int] = None, full: bool = False):
+        """Run object detection and color analysis on a frame (detection worker thread)
+
+        Unless full is set, the change gate decides whether the previous
+        result still holds, or whether only the changed region of the frame
+        needs new detections.
+        """
+        try:
             height, width = frame.shape[:2]
+            previous = self.get_latest_detection()
+            decision = self.change_gate.check(frame) if self.change_gate is not None else None
+            kind = decision.kind if decision is not None else "full"
+            if full or previous is None or not previous.get('success') or previous.get('frame_size') != [width, height]:
+                kind = "full"
+            CHANGE_GATE_DECISIONS.inc(decision=kind)
 
-            # Create blob from image
-            blob = cv2.dnn.blobFromImage(frame, 0.00392, (416, 416), (0, 0, 0), True, crop=False)
-            self.net.setInput(blob)
-            outs = self.net.forward(self.output_layers)
-
-            # Process detections
-            class_ids = []
-            confidences = []
-            boxes = []
-
-            for out in outs:
-                for detection in out:
-                    scores = detection[5:]
-                    class_id = np.argmax(scores)
-                    confidence = scores[class_id]
-                    
-                    if confidence > 0.5:  # Confidence threshold
-                        # Object detected
-                        center_x = int(detection[0] * width)
-                        center_y = int(detection[1] * height)
-                        w = int(detection[2] * width)
-                        h = int(detection[3] * height)
-
-                        # Rectangle coordinates
-                        x = int(center_x - w / 2)
-                        y = int(center_y - h / 2)
-
-                        boxes.append([x, y, w, h])
-                        confidences.append(float(confidence))
-                        class_ids.append(class_id)
-
-            # Apply non-max suppression
-            indexes = cv2.dnn.NMSBoxes(boxes, confidences, 0.5, 0.4)
+            if kind == "unchanged":
+                result = {**previous, 'frame_seq': frame_seq, 'inference': 'cached', 'roi': None}
+                result.pop('timestamp', None)
+                if log_events:
+                    self._log_analysis(result['objects'], result['colors'])
+                self._publish_detection(result)
+                return result
+
+            # Draw on a copy so the shared camera frame is left untouched
+            frame = frame.copy()
+
+            # Run the detector, which also applies non-max suppression
+            with ANALYSIS_STAGE_SECONDS.time(stage="detect"):
+                if kind == "roi":
+                    roi_x, roi_y, roi_w, roi_h = decision.box
+                    boxes, confidences, class_ids = self.detector.detect(frame[roi_y:roi_y + roi_h, roi_x:roi_x + roi_w])
+                    # Map region boxes back to frame coordinates
+                    boxes = boxes + np.array([roi_x, roi_y, 0, 0], dtype=boxes.dtype)
+                else:
+                    boxes, confidences, class_ids = self.detector.detect(frame)
+            
+            # Analyze colors before the frame is annotated
+            with ANALYSIS_STAGE_SECONDS.time(stage="colors"):
+                colors = analyze_colors(frame)
             
             # Process results
             objects = []
-            for i in range(len(boxes)):
-                if i in indexes:
-                    objects.append({
-                        'class': self.classes[class_ids[i]],
-                        'confidence': confidences[i]
-                    })
-
-                    # Draw detection on frame
-                    x, y, w, h = boxes[i]
-                    label = f"{self.classes[class_ids[i]]}: {confidences[i]:.2f}"
-                    cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                    cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-            # Convert frame to RGB format for color analysis
-            frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            colors = self._analyze_colors(frame_rgb)
-            
-            # Save the annotated frame
-            cv2.imwrite("static/latest_analysis.jpg", frame)
+            for (x, y, w, h), confidence, class_id in zip(boxes.tolist(), confidences.tolist(), class_ids.tolist()):
+                objects.append({
+                    'class': self.classes[class_id],
+                    'confidence': confidence,
+                    'box': [x, y, w, h]
+                })
+            if kind == "roi":
+                # Nothing changed outside the region, so earlier detections there still stand
+                objects.extend(obj for obj in previous['objects'] if not boxes_overlap(obj['box'], decision.box))
 
-            # Log the analysis results
-            if objects:
-                object_names = [obj['class'] for obj in objects]
-                self.add_event("ANALYSIS", f"Objects detected: {', '.join(object_names)}")
-            else:
-                self.add_event("ANALYSIS", "No objects detected")
+            # Draw detections on frame
+            for obj in objects:
+                x, y, w, h = obj['box']
+                label = f"{obj['class']}: {obj['confidence']:.2f}"
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, label, (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+
+            # Keep the annotated frame in memory under its own URL so analyses never overwrite each other
+            with ANALYSIS_STAGE_SECONDS.time(stage="encode"):
+                ok, encoded = cv2.imencode(".jpg", frame)
+            image_url = f"/api/analysis/images/{self.analysis_images.add(encoded.tobytes())}.jpg" if ok else None
 
-            if colors:
-                color_names = [f"{color['name']} ({(color['percentage'] * 100):.1f}%)" for color in colors[:3]]
-                self.add_event("ANALYSIS", f"Dominant colors: {', '.join(color_names)}")
+            # Streamed results only log when the set of detected objects changes
+            if not log_events:
+                log_events = (
+                    previous is None
+                    or not previous.get('success')
+                    or sorted(obj['class'] for obj in previous['objects']) != sorted(obj['class'] for obj in objects)
+                )
+
+            # Log the analysis results
+            if log_events:
+                self._log_analysis(objects, colors)
             
-            return {
+            result = {
                 'success': True,
                 'objects': objects,
                 'colors': colors,
-                'image_url': '/static/latest_analysis.jpg'
+                'frame_size': [width, height],
+                'frame_seq': frame_seq,
+                'image_url': image_url,
+                'inference': kind,
+                'roi': list(decision.box) if kind == "roi" else None
             }
+            if decision is not None:
+                self.change_gate.accept(decision, full=kind == "full")
+            self._publish_detection(result)
+            return result
             
         except Exception as e:
             print(f"Analysis error: {str(e)}")  # Add debug print
@@ -368,73 +707,13 @@ class RoverController:
                 'error': str(e)
             }
 
-    def _analyze_colors(self, frame, num_colors=5):
-        """Analyze dominant colors in the frame"""
-        try:
-            # Convert to PIL Image
-            img = Image.fromarray(frame)
-            
-            # Resize for faster processing
-            img = img.resize((150, 150))
-            
-            # Get colors from image
-            pixels = np.float32(img).reshape(-1, 3)
-            
-            # Use k-means to find dominant colors
-            criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 200, .1)
-            flags = cv2.KMEANS_RANDOM_CENTERS
-            _, labels, palette = cv2.kmeans(pixels, num_colors, None, criteria, 10, flags)
-            
-            # Calculate color percentages
-            _, counts = np.unique(labels, return_counts=True)
-            total_pixels = sum(counts)
-            percentages = counts / total_pixels
-            
-            # Convert RGB to HSV for color naming
-            colors = []
-            for color, percentage in zip(palette, percentages):
-                rgb = color / 255
-                hsv = colorsys.rgb_to_hsv(*rgb)
-                color_name = self._get_color_name(hsv)
-                
-                colors.append({
-                    'name': color_name,
-                    'percentage': float(percentage)
-                })
-            
-            # Sort by percentage
-            colors.sort(key=lambda x: x['percentage'], reverse=True)
-            return colors
-            
-        except Exception as e:
-            print(f"Error analyzing colors: {e}")
-            return []
-
-    def _get_color_name(self, hsv):
-        """Convert HSV values to color names"""
-        h, s, v = hsv
-        
-        # Convert hue to 360 degree format
-        h *= 360
-        
-        if s < 0.1:
-            if v < 0.2:
-                return "black"
-            elif v > 0.8:
-                return "white"
-            return "gray"
-            
-        if h < 30:
-            return "red"
-        elif h < 90:
-            return "yellow"
-        elif h < 150:
-            return "green"
-        elif h < 210:
-            return "cyan"
-        elif h < 270:
-            return "blue"
-        elif h < 330:
-            return "magenta"
+    def _log_analysis(self, objects: list, colors: list):
+        if objects:
+            object_names = [obj['class'] for obj in objects]
+            self.add_event("ANALYSIS", f"Objects detected: {', '.join(object_names)}")
         else:
-            return "red" 
\ No newline at end of file
+            self.add_event("ANALYSIS", "No objects detected")
+
+        if colors:
+            color_names = [f"{color['name']} ({(color['percentage'] * 100):.1f}%)" for color in colors[:3]]
+            self.add_event("ANALYSIS", f"Dominant colors: {', '.join(color_names)}")
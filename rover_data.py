@@ -1,9 +1,17 @@
 from dataclasses import dataclass
 from datetime import datetime
-from typing import List, Optional
-from collections import deque
+from typing import Dict, List, Optional
+from bisect import bisect_left, bisect_right
+import sys
+import threading
+import numpy as np
 
-@dataclass
+# Slotted dataclasses need Python 3.10+; older interpreters fall back to per-instance dicts
+_SLOTS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+MODES = ("manual", "autonomous")
+
+@dataclass(**_SLOTS)
 class RoverStatus:
     rover_id: int
     rover_name: str
@@ -13,37 +21,233 @@ class RoverStatus:
     timestamp: float
     camera_pan: int = 0
     camera_tilt: int = 0
+    vision_state: str = "idle"  # 'idle', 'loading', 'ready' or 'error'
+
+    def to_dict(self):
+        return {
+            "rover_id": self.rover_id,
+            "rover_name": self.rover_name,
+            "battery": self.battery,
+            "distance": self.distance,
+            "mode": self.mode,
+            "timestamp": self.timestamp,
+            "camera_pan": self.camera_pan,
+            "camera_tilt": self.camera_tilt,
+            "vision_state": self.vision_state
+        }
 
-@dataclass
+@dataclass(**_SLOTS)
 class RoverEvent:
     rover_id: int
     event_type: str  # 'STATUS', 'WARNING', 'ERROR', 'CONTROL'
     message: str
     timestamp: float
-    
+    seq: int = 0  # assigned by EventBuffer
+
     def to_dict(self):
         return {
+            "seq": self.seq,
             "rover_id": self.rover_id,
             "event_type": self.event_type,
             "message": self.message,
             "timestamp": self.timestamp
         }
 
+class TelemetryHistory:
+    """Columnar ring buffer of status samples.
+
+    Each field is a preallocated NumPy array, so recording a sample is a few
+    array stores and range queries and downsampling are vectorized, with no
+    Python object kept per sample.
+    """
+
+    def __init__(self, capacity: int = 7200):
+        self.capacity = capacity
+        self.timestamp = np.zeros(capacity, dtype=np.float64)
+        self.distance = np.zeros(capacity, dtype=np.float32)
+        self.battery = np.zeros(capacity, dtype=np.float32)
+        self.camera_pan = np.zeros(capacity, dtype=np.int16)
+        self.camera_tilt = np.zeros(capacity, dtype=np.int16)
+        self.mode = np.zeros(capacity, dtype=np.uint8)  # index into MODES
+        self._count = 0  # total samples ever recorded
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self._count, self.capacity)
+
+    def record(self, timestamp: float, distance: float, battery: float, camera_pan: int, camera_tilt: int, mode: str):
+        with self._lock:
+            i = self._count % self.capacity
+            self.timestamp[i] = timestamp
+            self.distance[i] = distance
+            self.battery[i] = battery
+            self.camera_pan[i] = camera_pan
+            self.camera_tilt[i] = camera_tilt
+            self.mode[i] = MODES.index(mode) if mode in MODES else 0
+            self._count += 1
+
+    def _ordered(self, column: np.ndarray) -> np.ndarray:
+        """Column in chronological order (copies only when the ring has wrapped)"""
+        if self._count <= self.capacity:
+            return column[:self._count]
+        head = self._count % self.capacity
+        return np.concatenate((column[head:], column[:head]))
+
+    def query(self, start: Optional[float] = None, end: Optional[float] = None, downsample: Optional[float] = None) -> dict:
+        """Samples with start <= timestamp <= end as parallel lists
+
+        With downsample (seconds), samples are averaged into buckets of that
+        width; mode is the last value in each bucket.
+        """
+        with self._lock:
+            timestamps = self._ordered(self.timestamp)
+            low = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+            high = len(timestamps) if end is None else int(np.searchsorted(timestamps, end, side="right"))
+            columns = {
+                name: self._ordered(getattr(self, name))[low:high].copy()
+                for name in ("distance", "battery", "camera_pan", "camera_tilt", "mode")
+            }
+            timestamps = timestamps[low:high].copy()
+
+        if downsample and len(timestamps):
+            buckets = np.floor((timestamps - timestamps[0]) / downsample).astype(np.int64)
+            starts = np.flatnonzero(np.diff(buckets, prepend=-1))
+            counts = np.diff(np.append(starts, len(timestamps)))
+            last = starts + counts - 1
+            for name in ("distance", "battery", "camera_pan", "camera_tilt"):
+                columns[name] = np.add.reduceat(columns[name].astype(np.float64), starts) / counts
+            columns["mode"] = columns["mode"][last]
+            timestamps = np.add.reduceat(timestamps, starts) / counts
+
+        return {
+            "timestamp": timestamps.tolist(),
+            "distance": np.round(columns["distance"], 2).tolist(),
+            "battery": np.round(columns["battery"], 2).tolist(),
+            "camera_pan": columns["camera_pan"].tolist(),
+            "camera_tilt": columns["camera_tilt"].tolist(),
+            "mode": [MODES[code] for code in columns["mode"].tolist()]
+        }
+
+class _SeqIndex:
+    """Ascending list of sequence ids with O(1) amortized trimming from the front"""
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.head
+
+    def append(self, seq: int):
+        self.seqs.append(seq)
+
+    def trim_before(self, seq: int):
+        while self.head < len(self.seqs) and self.seqs[self.head] < seq:
+            self.head += 1
+        # Compact once the dead prefix dominates the list
+        if self.head > 64 and self.head * 2 > len(self.seqs):
+            del self.seqs[:self.head]
+            self.head = 0
+
+    def newest(self, count: int, before: Optional[int] = None, since: Optional[int] = None, skip: int = 0) -> List[int]:
+        """Up to count seqs below before and above since, newest first, after skipping the newest skip"""
+        end = len(self.seqs) if before is None else bisect_left(self.seqs, before, self.head)
+        end -= skip
+        low = self.head if since is None else bisect_right(self.seqs, since, self.head)
+        start = max(low, end - count)
+        return self.seqs[start:end][::-1] if end > start else []
+
 class EventBuffer:
-    def __init__(self, capacity: int = 500):
+    """Fixed-capacity ring of events with monotonically increasing sequence ids.
+
+    Pages are read by offset (start) or by cursor (before/since seq) and only
+    touch the requested window. Per-event_type indexes make filtered queries
+    independent of how many other events are buffered.
+    """
+
+    def __init__(self, capacity: int = 500, first_seq: int = 1):
         self.capacity = capacity
-        self.events: deque = deque(maxlen=capacity)
-    
-    def add_event(self, event: RoverEvent):
-        self.events.append(event)
-    
-    def get_events(self, start: int = 0, limit: int = 50) -> List[dict]:
-        """Get events with pagination"""
-        events_list = list(self.events)
-        # Reverse the list for newest first
-        events_list.reverse()
-        end = min(start + limit, len(events_list))
-        return [event.to_dict() for event in events_list[start:end]]
-    
-    def get_total_events(self) -> int:
-        return len(self.events) 
\ No newline at end of file
+        self._slots: List[Optional[RoverEvent]] = [None] * capacity
+        self._start_seq = first_seq  # lets sequence ids continue from a persisted log
+        self._next_seq = first_seq
+        self._type_index: Dict[str, _SeqIndex] = {}
+        self._lock = threading.Lock()
+
+    def add_event(self, event: RoverEvent) -> int:
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+            event.seq = seq
+
+            slot = seq % self.capacity
+            evicted = self._slots[slot]
+            self._slots[slot] = event
+            if evicted is not None:
+                self._type_index[evicted.event_type].trim_before(evicted.seq + 1)
+
+            index = self._type_index.get(event.event_type)
+            if index is None:
+                index = self._type_index[event.event_type] = _SeqIndex()
+            index.append(seq)
+            return seq
+
+    @property
+    def latest_seq(self) -> int:
+        """Sequence id of the newest event (first_seq - 1 when empty)"""
+        return self._next_seq - 1
+
+    @property
+    def first_seq(self) -> int:
+        """Sequence id of the oldest event still buffered"""
+        return max(self._start_seq, self._next_seq - self.capacity)
+
+    def get_events(
+        self,
+        start: int = 0,
+        limit: int = 50,
+        event_type: Optional[str] = None,
+        before: Optional[int] = None,
+        since: Optional[int] = None
+    ) -> List[dict]:
+        """Get events newest first, paginated by offset (start) or seq cursors (before/since)"""
+        return self.get_page(start, limit, event_type, before, since)["events"]
+
+    def get_page(
+        self,
+        start: int = 0,
+        limit: int = 50,
+        event_type: Optional[str] = None,
+        before: Optional[int] = None,
+        since: Optional[int] = None
+    ) -> dict:
+        """Get a page of events plus the cursors needed to fetch the next one"""
+        with self._lock:
+            first, latest = self.first_seq, self.latest_seq
+            if event_type is None:
+                end = latest + 1 if before is None else min(before, latest + 1)
+                end -= start
+                low = first if since is None else max(first, since + 1)
+                seqs = range(end - 1, max(low, end - limit) - 1, -1)
+                has_more = len(seqs) > 0 and seqs[-1] > low
+                total = latest - first + 1
+            else:
+                index = self._type_index.get(event_type)
+                seqs = index.newest(limit, before, since, start) if index is not None else []
+                has_more = len(seqs) > 0 and len(index.newest(1, seqs[-1], since)) > 0
+                total = len(index) if index is not None else 0
+            events = [self._slots[seq % self.capacity] for seq in seqs]
+
+        return {
+            "events": [event.to_dict() for event in events],
+            "total": total,
+            "has_more": has_more,
+            "next_before": events[-1].seq if events else None,
+            "latest_seq": latest
+        }
+
+    def get_total_events(self, event_type: Optional[str] = None) -> int:
+        with self._lock:
+            if event_type is not None:
+                index = self._type_index.get(event_type)
+                return len(index) if index is not None else 0
+            return self.latest_seq - self.first_seq + 1
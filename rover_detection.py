@@ -0,0 +1,527 @@
+import itertools
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass, asdict, field
+from typing import Callable, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+import rover_metrics
+
+DETECTION_STAGE_SECONDS = rover_metrics.histogram(
+    "rover_detection_stage_seconds", "Time spent in each stage of object detection", ("stage",)
+)
+_BLOB_STAGE = DETECTION_STAGE_SECONDS.labels(stage="blob")
+_FORWARD_STAGE = DETECTION_STAGE_SECONDS.labels(stage="forward")
+_DECODE_STAGE = DETECTION_STAGE_SECONDS.labels(stage="decode")
+CHANGE_GATE_DECISIONS = rover_metrics.counter(
+    "rover_change_gate_decisions_total", "Analyses by how much of the frame needed inference", ("decision",)
+)
+
+
+def decode_yolo_outputs(
+    outs: List[np.ndarray],
+    width: int,
+    height: int,
+    conf_threshold: float = 0.5,
+    nms_threshold: float = 0.4
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Decode raw YOLO output layers into non-max suppressed detections.
+
+    Each output row is [center_x, center_y, w, h, objectness, class scores...]
+    with coordinates normalized to the frame. All rows are decoded in one
+    batched NumPy pass. Returns (boxes, confidences, class_ids) for the kept
+    detections in output order, with boxes as integer [x, y, w, h] pixels.
+    """
+    detections = np.concatenate([out.reshape(-1, out.shape[-1]) for out in outs], axis=0)
+    scores = detections[:, 5:]
+    class_ids = scores.argmax(axis=1)
+    confidences = scores[np.arange(len(scores)), class_ids]
+
+    # Threshold before any box math so only candidate rows are converted
+    mask = confidences > conf_threshold
+    if not mask.any():
+        return np.empty((0, 4), dtype=np.int32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+    detections = detections[mask]
+    confidences = confidences[mask]
+    class_ids = class_ids[mask]
+
+    # astype truncates toward zero, matching int() on the per-row values
+    center_x = (detections[:, 0] * width).astype(np.int32)
+    center_y = (detections[:, 1] * height).astype(np.int32)
+    w = (detections[:, 2] * width).astype(np.int32)
+    h = (detections[:, 3] * height).astype(np.int32)
+    x = (center_x - w / 2).astype(np.int32)
+    y = (center_y - h / 2).astype(np.int32)
+    boxes = np.stack([x, y, w, h], axis=1)
+
+    indexes = cv2.dnn.NMSBoxes(boxes.tolist(), confidences.tolist(), conf_threshold, nms_threshold)
+    keep = np.sort(np.asarray(indexes, dtype=np.int64).reshape(-1))
+    return boxes[keep], confidences[keep], class_ids[keep]
+
+
+# Known detector models: file names and their natural input size
+DETECTOR_MODELS = {
+    "yolov3": {"format": "darknet", "weights": "yolov3.weights", "config": "yolov3.cfg", "input_size": (416, 416)},
+    "yolov3-tiny": {"format": "darknet", "weights": "yolov3-tiny.weights", "config": "yolov3-tiny.cfg", "input_size": (416, 416)},
+    "yolov4-tiny": {"format": "darknet", "weights": "yolov4-tiny.weights", "config": "yolov4-tiny.cfg", "input_size": (416, 416)},
+    "onnx": {"format": "onnx", "weights": "yolov5n.onnx", "config": None, "input_size": (640, 640)},
+    # Stand-in network for the simulator backend (rover_sim.SimDetector), no model files needed
+    "sim": {"format": "sim", "weights": None, "config": None, "input_size": (416, 416)},
+}
+
+DNN_BACKENDS = {
+    "default": "DNN_BACKEND_DEFAULT",
+    "opencv": "DNN_BACKEND_OPENCV",
+    "inference_engine": "DNN_BACKEND_INFERENCE_ENGINE",
+    "cuda": "DNN_BACKEND_CUDA",
+    "vulkan": "DNN_BACKEND_VKCOM",
+}
+
+DNN_TARGETS = {
+    "cpu": "DNN_TARGET_CPU",
+    "opencl": "DNN_TARGET_OPENCL",
+    "opencl_fp16": "DNN_TARGET_OPENCL_FP16",
+    "vulkan": "DNN_TARGET_VULKAN",
+    "cuda": "DNN_TARGET_CUDA",
+    "cuda_fp16": "DNN_TARGET_CUDA_FP16",
+    "myriad": "DNN_TARGET_MYRIAD",
+}
+
+
+# Loaded networks and class lists, keyed by file identity, so re-initializing
+# vision in the same process does not re-read hundreds of MB of weights
+_model_cache = {}
+_model_cache_lock = threading.Lock()
+
+
+def _file_key(path: Optional[str]):
+    if path is None:
+        return None
+    stat = os.stat(path)
+    return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+@dataclass
+class DetectorConfig:
+    model: str = "yolov3"
+    weights: Optional[str] = None  # defaults to the model's file name
+    config: Optional[str] = None
+    classes: str = "coco.names"
+    input_width: Optional[int] = None  # defaults to the model's input size
+    input_height: Optional[int] = None
+    conf_threshold: float = 0.5
+    nms_threshold: float = 0.4
+    backend: str = "default"
+    target: str = "cpu"
+
+    @classmethod
+    def from_env(cls) -> "DetectorConfig":
+        """Build a config from ROVER_DETECTOR_* / ROVER_DNN_* environment variables"""
+        env = os.environ
+        # The simulator detects its own obstacles unless a real model is asked for
+        default_model = "sim" if env.get("ROVER_BACKEND") == "sim" else cls.model
+        config = cls(
+            model=env.get("ROVER_DETECTOR_MODEL", default_model),
+            weights=env.get("ROVER_DETECTOR_WEIGHTS"),
+            config=env.get("ROVER_DETECTOR_CONFIG"),
+            classes=env.get("ROVER_DETECTOR_CLASSES", cls.classes),
+            conf_threshold=float(env.get("ROVER_DETECTOR_CONF", cls.conf_threshold)),
+            nms_threshold=float(env.get("ROVER_DETECTOR_NMS", cls.nms_threshold)),
+            backend=env.get("ROVER_DNN_BACKEND", cls.backend),
+            target=env.get("ROVER_DNN_TARGET", cls.target),
+        )
+        # Accept "320" for a square input or "320x256" for width x height
+        input_size = env.get("ROVER_DETECTOR_INPUT_SIZE")
+        if input_size:
+            width, _, height = input_size.lower().partition("x")
+            config.input_width = int(width)
+            config.input_height = int(height or width)
+        return config
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+class DetectorBackend:
+    """Base class for object detectors run by the detection worker.
+
+    Subclasses load a network in load() and turn a BGR frame into
+    (boxes, confidences, class_ids) in detect(), with boxes as integer
+    [x, y, w, h] frame pixels.
+    """
+
+    def __init__(self, config: DetectorConfig):
+        self.config = config
+        spec = DETECTOR_MODELS[config.model]
+        self.weights = config.weights or spec["weights"]
+        self.model_config = config.config or spec["config"]
+        self.input_size = (
+            config.input_width or spec["input_size"][0],
+            config.input_height or spec["input_size"][1]
+        )
+        self.net = None
+        self.classes: List[str] = []
+        self.output_layers: List[str] = []
+        # Cached networks can be shared between detectors, and forward() is not thread-safe
+        self._net_lock = threading.Lock()
+
+    def load(self):
+        """Load the network and class names, reusing a cached copy when the files are unchanged"""
+        key = (
+            type(self).__name__,
+            _file_key(self.weights),
+            _file_key(self.model_config),
+            _file_key(self.config.classes),
+            self.config.backend,
+            self.config.target
+        )
+        with _model_cache_lock:
+            cached = _model_cache.get(key)
+            if cached is None:
+                cached = self._load_uncached()
+                _model_cache[key] = cached
+        self.net, self.classes, self.output_layers, self._net_lock = cached
+
+    def _load_uncached(self):
+        net = self._read_net()
+        net.setPreferableBackend(getattr(cv2.dnn, DNN_BACKENDS[self.config.backend]))
+        net.setPreferableTarget(getattr(cv2.dnn, DNN_TARGETS[self.config.target]))
+
+        with open(self.config.classes, "r") as f:
+            classes = [line.strip() for line in f.readlines()]
+
+        # Get output layer names
+        layer_names = net.getLayerNames()
+        output_layers = [layer_names[i - 1] for i in np.asarray(net.getUnconnectedOutLayers()).flatten()]
+        return net, classes, output_layers, threading.Lock()
+
+    def warm_up(self):
+        """Run one inference on a blank frame so the first real request skips lazy allocation"""
+        width, height = self.input_size
+        self.detect(np.zeros((height, width, 3), dtype=np.uint8))
+
+    def detect(self, frame: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        height, width = frame.shape[:2]
+        with _BLOB_STAGE.time():
+            blob = cv2.dnn.blobFromImage(frame, 1 / 255.0, self.input_size, (0, 0, 0), True, crop=False)
+        with self._net_lock:
+            self.net.setInput(blob)
+            with _FORWARD_STAGE.time():
+                outs = self.net.forward(self.output_layers)
+        with _DECODE_STAGE.time():
+            outs = self._normalize_outputs(outs)
+            return decode_yolo_outputs(outs, width, height, self.config.conf_threshold, self.config.nms_threshold)
+
+    def _read_net(self):
+        raise NotImplementedError
+
+    def _normalize_outputs(self, outs: List[np.ndarray]) -> List[np.ndarray]:
+        """Convert raw network outputs to normalized darknet-style rows"""
+        return outs
+
+
+class DarknetDetector(DetectorBackend):
+    """YOLOv3/YOLOv4 family models in darknet cfg/weights format"""
+
+    def _read_net(self):
+        return cv2.dnn.readNetFromDarknet(self.model_config, self.weights)
+
+
+class OnnxDetector(DetectorBackend):
+    """YOLOv5/YOLOv8 style models exported to ONNX.
+
+    YOLOv5 rows are [cx, cy, w, h, objectness, class scores...] in input
+    pixels; YOLOv8 outputs are transposed and have no objectness column.
+    """
+
+    def _read_net(self):
+        return cv2.dnn.readNetFromONNX(self.weights)
+
+    def _normalize_outputs(self, outs: List[np.ndarray]) -> List[np.ndarray]:
+        input_width, input_height = self.input_size
+        scale = np.array([input_width, input_height, input_width, input_height], dtype=np.float32)
+        normalized = []
+        for out in outs:
+            rows = out.reshape(out.shape[-2], out.shape[-1])
+            if rows.shape[1] != len(self.classes) + 5 and rows.shape[0] == len(self.classes) + 4:
+                # YOLOv8: (4 + classes, N) with class scores already final
+                rows = rows.T
+                rows = np.concatenate([rows[:, :4], np.ones((len(rows), 1), dtype=rows.dtype), rows[:, 4:]], axis=1)
+            else:
+                rows = rows.copy()
+                rows[:, 5:] *= rows[:, 4:5]
+            rows[:, :4] /= scale
+            normalized.append(rows)
+        return normalized
+
+
+DETECTOR_BACKENDS = {
+    "darknet": DarknetDetector,
+    "onnx": OnnxDetector,
+}
+
+
+def create_detector(config: Optional[DetectorConfig] = None) -> DetectorBackend:
+    """Create the detector backend for a config (environment defaults when omitted)"""
+    config = config or DetectorConfig.from_env()
+    if config.model not in DETECTOR_MODELS:
+        raise ValueError(f"Unknown detector model: {config.model}")
+    if config.backend not in DNN_BACKENDS:
+        raise ValueError(f"Unknown DNN backend: {config.backend}")
+    if config.target not in DNN_TARGETS:
+        raise ValueError(f"Unknown DNN target: {config.target}")
+    if DETECTOR_MODELS[config.model]["format"] == "sim":
+        # Imported here since the simulator itself builds on this module
+        from rover_sim import SimDetector
+        return SimDetector(config)
+    return DETECTOR_BACKENDS[DETECTOR_MODELS[config.model]["format"]](config)
+
+
+@dataclass
+class ChangeDecision:
+    kind: str  # "unchanged", "roi" or "full"
+    changed: float  # fraction of thumbnail pixels that changed
+    box: Optional[Tuple[int, int, int, int]] = None  # region to analyze in frame pixels, for "roi"
+    thumbnail: Optional[np.ndarray] = field(default=None, repr=False)
+
+
+class ChangeGate:
+    """Frame differencing that decides how much of a frame needs inference.
+
+    Frames are reduced to small blurred grayscale thumbnails and compared
+    with the thumbnail of the last analyzed frame (not the previous frame,
+    so slow changes still add up). Almost no changed pixels means the
+    previous result still holds; change confined to part of the frame
+    yields a padded region to analyze; anything larger needs the whole
+    frame. A full analysis is forced every max_age seconds regardless, so
+    lighting drift or a missed detection can't persist.
+    """
+
+    def __init__(
+        self,
+        thumbnail_width: int = 96,
+        pixel_threshold: int = 20,
+        min_changed: float = 0.003,
+        max_roi_area: float = 0.4,
+        margin: float = 0.1,
+        min_roi_size: float = 0.3,
+        max_age: float = 10.0
+    ):
+        self.thumbnail_width = thumbnail_width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_roi_area = max_roi_area
+        self.margin = margin
+        self.min_roi_size = min_roi_size
+        self.max_age = max_age
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+        self._reference: Optional[np.ndarray] = None
+        self._last_full = 0.0
+
+    def reset(self):
+        self._reference = None
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        height, width = frame.shape[:2]
+        size = (self.thumbnail_width, max(1, round(self.thumbnail_width * height / width)))
+        # Shrinking first keeps the color conversion and blur on a few thousand pixels
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (3, 3), 0)
+
+    def check(self, frame: np.ndarray) -> ChangeDecision:
+        thumbnail = self._thumbnail(frame)
+        reference = self._reference
+        if (
+            reference is None
+            or reference.shape != thumbnail.shape
+            or time.monotonic() - self._last_full >= self.max_age
+        ):
+            return ChangeDecision("full", 1.0, thumbnail=thumbnail)
+
+        mask = (cv2.absdiff(thumbnail, reference) > self.pixel_threshold).astype(np.uint8)
+        # Opening drops isolated pixels from sensor noise and compression artifacts
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self._kernel)
+        changed = cv2.countNonZero(mask) / mask.size
+        if changed < self.min_changed:
+            return ChangeDecision("unchanged", changed, thumbnail=thumbnail)
+
+        x, y, w, h = cv2.boundingRect(mask)
+        if w * h > self.max_roi_area * mask.size:
+            return ChangeDecision("full", changed, thumbnail=thumbnail)
+        height, width = frame.shape[:2]
+        scale_x = width / mask.shape[1]
+        scale_y = height / mask.shape[0]
+        box = self._expand(x * scale_x, y * scale_y, w * scale_x, h * scale_y, width, height)
+        return ChangeDecision("roi", changed, box, thumbnail)
+
+    def _expand(self, x: float, y: float, w: float, h: float, width: int, height: int) -> Tuple[int, int, int, int]:
+        """Pad a region by the margin and grow it to the minimum size, kept inside the frame"""
+        def axis(start: float, length: float, limit: int) -> Tuple[int, int]:
+            center = start + length / 2
+            length = min(float(limit), max(length + 2 * self.margin * limit, self.min_roi_size * limit))
+            start = min(max(0.0, center - length / 2), limit - length)
+            return int(start), int(round(length))
+
+        x0, w0 = axis(x, w, width)
+        y0, h0 = axis(y, h, height)
+        return x0, y0, w0, h0
+
+    def accept(self, decision: ChangeDecision, full: bool):
+        """Make an analyzed frame the new reference; full if the whole frame was analyzed"""
+        self._reference = decision.thumbnail
+        if full:
+            self._last_full = time.monotonic()
+
+
+def boxes_overlap(a, b) -> bool:
+    """Whether two [x, y, w, h] boxes intersect"""
+    return a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and a[1] < b[1] + b[3] and b[1] < a[1] + a[3]
+
+
+class DetectionJob:
+    """A single analysis request tracked by the detection worker"""
+
+    def __init__(self, job_id: int, frame, options: Optional[dict] = None, key=None):
+        self.job_id = job_id
+        self.frame = frame
+        self.options = options or {}
+        self.key = key  # coalescing key while queued or in progress
+        self.future: Future = Future()
+        self.created = time.time()
+
+    def resolve(self, result: dict):
+        # Drop the frame reference once the job is done so finished jobs stay cheap
+        self.frame = None
+        if not self.future.done():
+            self.future.set_result(result)
+
+    def to_dict(self) -> dict:
+        done = self.future.done()
+        return {
+            "job_id": self.job_id,
+            "status": "done" if done else "pending",
+            "created": self.created,
+            "result": self.future.result() if done else None
+        }
+
+
+class DetectionWorker:
+    """Runs analysis jobs on a dedicated thread that owns the detection network.
+
+    Jobs are accepted through a bounded queue. Requests for a frame that is
+    already queued or being analyzed with the same options are coalesced
+    onto the existing job so concurrent callers share one inference.
+    """
+
+    def __init__(self, analyze_fn: Callable[[object], dict], max_pending: int = 4, max_finished: int = 32):
+        self._analyze = analyze_fn
+        self._queue: queue.Queue = queue.Queue(maxsize=max_pending)
+        self._pending = {}  # coalescing key -> job, for frames queued or in progress
+        self._jobs: OrderedDict = OrderedDict()  # job_id -> job, most recent last
+        self._max_finished = max_finished
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._shutdown_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the worker thread"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._shutdown_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detection-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        """Stop the worker thread and fail any jobs still waiting"""
+        self._shutdown_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            self._finish(job, {"success": False, "error": "Detection worker stopped"})
+
+    def submit(self, frame, **options) -> DetectionJob:
+        """Queue a frame for analysis, reusing the in-flight job for the same frame
+
+        Keyword options are passed through to the analyze function. Frames are
+        identified by the frame_seq option when given, so only requests for
+        the same frame with the same options share a job.
+        """
+        key = None
+        if frame is not None:
+            # Without a seq, fall back to the frame object: the pending job keeps it alive, so its id is not reused
+            key = (options.get("frame_seq", id(frame)), tuple(sorted(options.items())))
+        with self._lock:
+            if key is not None:
+                job = self._pending.get(key)
+                if job is not None:
+                    return job
+
+            job = DetectionJob(next(self._ids), frame, options, key)
+            self._remember(job)
+
+            if frame is None:
+                job.resolve({"success": False, "error": "Failed to capture frame"})
+                return job
+            if self._shutdown_event.is_set() or self._thread is None:
+                job.resolve({"success": False, "error": "Detection worker is not running"})
+                return job
+
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                job.resolve({"success": False, "error": "Analysis queue is full"})
+                return job
+
+            self._pending[key] = job
+            return job
+
+    def get_job(self, job_id: int) -> Optional[DetectionJob]:
+        """Look up a recent job by id"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    @property
+    def busy(self) -> bool:
+        """True while any job is queued or being analyzed"""
+        with self._lock:
+            return bool(self._pending)
+
+    def _remember(self, job: DetectionJob):
+        self._jobs[job.job_id] = job
+        while len(self._jobs) > self._max_finished:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if not oldest.future.done():
+                break
+            del self._jobs[oldest_id]
+
+    def _finish(self, job: DetectionJob, result: dict):
+        with self._lock:
+            if job.key is not None and self._pending.get(job.key) is job:
+                del self._pending[job.key]
+            job.resolve(result)
+
+    def _run(self):
+        while not self._shutdown_event.is_set():
+            try:
+                job = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            try:
+                result = self._analyze(job.frame, **job.options)
+            except Exception as e:
+                result = {"success": False, "error": str(e)}
+            self._finish(job, result)
@@ -0,0 +1,334 @@
+import os
+import queue
+import struct
+import threading
+import zlib
+from bisect import bisect_left
+from typing import List, Optional, Tuple
+
+from rover_data import RoverEvent
+
+# Record layout: header (body length, crc32, seq, timestamp, rover_id, event type length)
+# followed by the UTF-8 event type and message. The crc covers everything after itself.
+RECORD_HEADER = struct.Struct("<IIQdIH")
+SEGMENT_PREFIX = "events_"
+SEGMENT_SUFFIX = ".log"
+
+
+def encode_event(event: RoverEvent) -> bytes:
+    event_type = event.event_type.encode("utf-8")
+    body = event_type + event.message.encode("utf-8")
+    fields = struct.pack("<QdIH", event.seq, event.timestamp, event.rover_id, len(event_type))
+    crc = zlib.crc32(body, zlib.crc32(fields))
+    return RECORD_HEADER.pack(len(body), crc, event.seq, event.timestamp, event.rover_id, len(event_type)) + body
+
+
+def format_cursor(first_seq: int, offset: int) -> str:
+    """Query cursor for the record at offset in the segment starting at first_seq"""
+    return f"{first_seq}:{offset}"
+
+
+def parse_cursor(cursor: str) -> Tuple[int, int]:
+    first_seq, separator, offset = cursor.partition(":")
+    if not separator:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return int(first_seq), int(offset)
+
+
+class _Segment:
+    """One log file plus a sparse (timestamp, offset) index of its records
+
+    Appends are not strictly in timestamp order, so each index entry holds
+    the highest timestamp of every record up to the end of its block. That
+    keeps the index sorted, and all blocks before the first entry >= t
+    contain only records older than t.
+    """
+
+    def __init__(self, path: str, first_seq: int):
+        self.path = path
+        self.first_seq = first_seq
+        self.size = 0  # bytes of complete records
+        self.count = 0
+        self.min_timestamp: Optional[float] = None
+        self.max_timestamp: Optional[float] = None
+        self.last_seq = first_seq - 1
+        self.index_timestamps: List[float] = []
+        self.index_offsets: List[int] = []
+
+    def note_record(self, offset: int, length: int, seq: int, timestamp: float, index_interval: int):
+        if self.min_timestamp is None:
+            self.min_timestamp = self.max_timestamp = timestamp
+        else:
+            self.min_timestamp = min(self.min_timestamp, timestamp)
+            self.max_timestamp = max(self.max_timestamp, timestamp)
+        if self.count % index_interval == 0:
+            self.index_timestamps.append(self.max_timestamp)
+            self.index_offsets.append(offset)
+        else:
+            self.index_timestamps[-1] = self.max_timestamp
+        self.last_seq = max(self.last_seq, seq)
+        self.count += 1
+        self.size = offset + length
+
+    def seek_offset(self, timestamp: float) -> int:
+        """Offset of the first block that may hold a record at or after timestamp"""
+        position = bisect_left(self.index_timestamps, timestamp)
+        return self.index_offsets[position] if position < len(self.index_offsets) else self.size
+
+
+class EventLog:
+    """Disk-backed, append-only store of rover events.
+
+    Events are queued by append() and written in batches by a background
+    thread into segment files of length-prefixed records. Segments rotate
+    at a size limit and the oldest are deleted past a count limit. On open,
+    existing segments are scanned header by header (skipping bodies) to
+    rebuild a sparse timestamp index and to drop any torn record at the
+    tail, so time-range queries seek straight to the right place instead of
+    loading whole files. Queries page by position in the log, so a page
+    continues exactly where the previous one stopped.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_segment_bytes: int = 4 * 1024 * 1024,
+        max_segments: int = 16,
+        index_interval: int = 64,
+        batch_size: int = 256,
+        queue_size: int = 10000
+    ):
+        self.directory = directory
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segments = max_segments
+        self.index_interval = index_interval
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._segments: List[_Segment] = []
+        self._lock = threading.Lock()  # guards the segment list and their indexes
+        self._file = None
+        self._thread: Optional[threading.Thread] = None
+        self.next_seq = 1
+        self.dropped = 0
+
+    def open(self):
+        """Load existing segments and start the writer thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        names = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        for name in names:
+            first_seq = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+            segment = _Segment(os.path.join(self.directory, name), first_seq)
+            self._scan(segment)
+            self._segments.append(segment)
+        if self._segments:
+            self.next_seq = self._segments[-1].last_seq + 1
+
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+
+    def close(self, timeout: float = 2.0):
+        """Flush queued events and stop the writer"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def append(self, event: RoverEvent):
+        """Queue an event for writing without blocking the caller"""
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.dropped += 1
+
+    def query(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        limit: int = 100,
+        event_type: Optional[str] = None,
+        cursor: Optional[str] = None
+    ) -> dict:
+        """Events with start <= timestamp <= end, in the order they were logged
+
+        Pass the previous page's next_cursor as cursor to continue a range.
+        Raises ValueError for a malformed cursor.
+        """
+        after = parse_cursor(cursor) if cursor is not None else None
+        with self._lock:
+            segments = []
+            for segment in self._segments:
+                if not segment.count:
+                    continue
+                if start is not None and segment.max_timestamp < start:
+                    continue
+                if end is not None and segment.min_timestamp > end:
+                    continue
+                if after is not None and segment.first_seq < after[0]:
+                    continue
+                if after is not None and segment.first_seq == after[0]:
+                    offset = after[1]
+                elif start is not None:
+                    offset = segment.seek_offset(start)
+                else:
+                    offset = 0
+                segments.append((segment, offset, segment.size))
+
+        events = []
+        next_cursor = None
+        for segment, offset, size in segments:
+            for record_offset, event in self._read(segment.path, offset, size):
+                # Timestamps are only roughly in log order, so check every record in range
+                if start is not None and event.timestamp < start:
+                    continue
+                if end is not None and event.timestamp > end:
+                    continue
+                if event_type is not None and event.event_type != event_type:
+                    continue
+                if len(events) >= limit:
+                    next_cursor = format_cursor(segment.first_seq, record_offset)
+                    break
+                events.append(event)
+            if next_cursor is not None:
+                break
+
+        return {
+            "events": [event.to_dict() for event in events],
+            "has_more": next_cursor is not None,
+            "next_cursor": next_cursor
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "events": sum(segment.count for segment in self._segments),
+                "bytes": sum(segment.size for segment in self._segments),
+                "queued": self._queue.qsize(),
+                "dropped": self.dropped,
+                "next_seq": self.next_seq
+            }
+
+    def _scan(self, segment: _Segment):
+        """Rebuild a segment's index from record headers and cut off a torn tail"""
+        file_size = os.path.getsize(segment.path)
+        with open(segment.path, "rb") as f:
+            offset = 0
+            while offset + RECORD_HEADER.size <= file_size:
+                header = f.read(RECORD_HEADER.size)
+                length, _, seq, timestamp, _, _ = RECORD_HEADER.unpack(header)
+                if offset + RECORD_HEADER.size + length > file_size:
+                    break
+                segment.note_record(offset, RECORD_HEADER.size + length, seq, timestamp, self.index_interval)
+                offset += RECORD_HEADER.size + length
+                f.seek(offset)
+        if segment.size < file_size:
+            with open(segment.path, "r+b") as f:
+                f.truncate(segment.size)
+
+    def _read(self, path: str, offset: int, size: int, chunk_size: int = 64 * 1024):
+        """Yield (offset, event) for the records between offset and size, reading the file in chunks"""
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            # Deleted by retention while the query was running
+            return
+        with f:
+            f.seek(offset)
+            remaining = size - offset
+            data = b""
+            data_offset = offset  # file offset of data[0]
+            position = 0
+            while True:
+                if position + RECORD_HEADER.size > len(data) or \
+                        position + RECORD_HEADER.size + RECORD_HEADER.unpack_from(data, position)[0] > len(data):
+                    if remaining <= 0:
+                        return
+                    chunk = f.read(min(chunk_size, remaining))
+                    if not chunk:
+                        return
+                    remaining -= len(chunk)
+                    data_offset += position
+                    data = data[position:] + chunk
+                    position = 0
+                    continue
+
+                length, crc, seq, timestamp, rover_id, type_length = RECORD_HEADER.unpack_from(data, position)
+                fields = data[position + 8:position + RECORD_HEADER.size]
+                body = data[position + RECORD_HEADER.size:position + RECORD_HEADER.size + length]
+                record_offset = data_offset + position
+                position += RECORD_HEADER.size + length
+                if zlib.crc32(body, zlib.crc32(fields)) != crc:
+                    continue
+                yield record_offset, RoverEvent(
+                    rover_id=rover_id,
+                    event_type=body[:type_length].decode("utf-8", "replace"),
+                    message=body[type_length:].decode("utf-8", "replace"),
+                    timestamp=timestamp,
+                    seq=seq
+                )
+
+    def _open_segment(self, first_seq: int):
+        path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{first_seq:012d}{SEGMENT_SUFFIX}")
+        segment = _Segment(path, first_seq)
+        self._file = open(path, "ab")
+        with self._lock:
+            self._segments.append(segment)
+            # Enforce retention by deleting whole segments, oldest first
+            while len(self._segments) > self.max_segments:
+                oldest = self._segments.pop(0)
+                os.remove(oldest.path)
+
+    def _write_batch(self, events: List[RoverEvent]):
+        if self._file is None:
+            segment = self._segments[-1] if self._segments else None
+            if segment is not None and segment.size < self.max_segment_bytes:
+                self._file = open(segment.path, "ab")
+            else:
+                self._open_segment(events[0].seq)
+
+        records = [encode_event(event) for event in events]
+        self._file.write(b"".join(records))
+        self._file.flush()
+
+        # Index the records only once they are on disk, so readers never see a partial write
+        with self._lock:
+            segment = self._segments[-1]
+            for event, record in zip(events, records):
+                segment.note_record(segment.size, len(record), event.seq, event.timestamp, self.index_interval)
+            new_size = segment.size
+        # add_event callers race between seq assignment and append, so order may differ slightly
+        self.next_seq = max(self.next_seq, max(event.seq for event in events) + 1)
+
+        if new_size >= self.max_segment_bytes:
+            self._file.close()
+            self._file = None
+            self._open_segment(self.next_seq)
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            event = self._queue.get()
+            if event is None:
+                break
+            batch = [event]
+            # Drain whatever else is waiting so one write covers the burst
+            while len(batch) < self.batch_size:
+                try:
+                    event = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                print(f"Event log write error: {str(e)}")  # Console logging
+        if self._file is not None:
+            self._file.close()
+            self._file = None
@@ -0,0 +1,181 @@
+import asyncio
+import heapq
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+import aiohttp
+
+from rover_controller import RoverController
+
+
+class LocalRover:
+    """A rover whose controller runs in this process"""
+
+    remote = False
+
+    def __init__(self, controller: RoverController):
+        self.controller = controller
+        self.rover_id = controller.rover_id
+
+    async def _call(self, fn, *args):
+        # The controller talks to hardware and takes locks; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def status(self) -> dict:
+        return await self._call(self.controller.get_status)
+
+    async def events(self, **params) -> dict:
+        return await self._call(
+            self.controller.event_buffer.get_page,
+            params.get("start", 0),
+            params.get("limit", 50),
+            params.get("event_type"),
+            params.get("before"),
+            params.get("since")
+        )
+
+    async def control(self, command: str) -> dict:
+        return {"success": await self._call(self.controller.handle_movement_command, command)}
+
+    async def camera(self, pan: Optional[int], tilt: Optional[int]) -> dict:
+        return {"success": await self._call(self.controller.handle_camera_command, pan, tilt)}
+
+    async def set_mode(self, mode: str) -> dict:
+        return {"success": await self._call(self.controller.set_mode, mode)}
+
+    async def snapshot(self) -> dict:
+        future = await self._call(self.controller.capture_snapshot)
+        return await asyncio.wrap_future(future)
+
+    async def analyze(self) -> dict:
+        try:
+            return await asyncio.wrap_future(self.controller.submit_analysis().future)
+        except Exception as e:
+            return {"success": False, "error": str(e)}
+
+
+class RemoteRover:
+    """A rover reached over HTTP through the rover_server API it runs"""
+
+    remote = True
+
+    def __init__(
+        self,
+        rover_id: int,
+        base_url: str,
+        session_getter: Callable[[], aiohttp.ClientSession],
+        timeout: float = 2.0,
+        analyze_timeout: float = 30.0
+    ):
+        self.rover_id = rover_id
+        self.base_url = base_url.rstrip("/")
+        self._get_session = session_getter
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.analyze_timeout = aiohttp.ClientTimeout(total=analyze_timeout)
+
+    async def _request(self, method: str, path: str, timeout=None, **kwargs) -> dict:
+        async with self._get_session().request(
+            method, self.base_url + path, timeout=timeout or self.timeout, **kwargs
+        ) as response:
+            response.raise_for_status()
+            return await response.json()
+
+    async def status(self) -> dict:
+        return await self._request("GET", "/api/status")
+
+    async def events(self, **params) -> dict:
+        query = {key: value for key, value in params.items() if value is not None}
+        return await self._request("GET", "/api/events", params=query)
+
+    async def control(self, command: str) -> dict:
+        return await self._request("POST", f"/api/control/{command}")
+
+    async def camera(self, pan: Optional[int], tilt: Optional[int]) -> dict:
+        return await self._request("POST", "/api/camera", json={"pan": pan, "tilt": tilt})
+
+    async def set_mode(self, mode: str) -> dict:
+        return await self._request("POST", "/api/mode", json={"mode": mode})
+
+    async def snapshot(self) -> dict:
+        return await self._request("POST", "/api/snapshot")
+
+    async def analyze(self) -> dict:
+        return await self._request("POST", "/api/analyze", timeout=self.analyze_timeout)
+
+
+class Fleet:
+    """Registry of the rovers this gateway manages.
+
+    Fleet-wide reads fan out to every rover concurrently over the shared
+    connection pool, so one slow or offline rover costs at most its
+    timeout and never delays the others.
+    """
+
+    def __init__(self):
+        self._rovers: Dict[int, object] = {}
+
+    def add(self, rover):
+        if rover.rover_id in self._rovers:
+            raise ValueError(f"Rover {rover.rover_id} is already registered")
+        self._rovers[rover.rover_id] = rover
+
+    def remove(self, rover_id: int):
+        self._rovers.pop(rover_id, None)
+
+    def get(self, rover_id: int):
+        return self._rovers.get(rover_id)
+
+    def __len__(self) -> int:
+        return len(self._rovers)
+
+    async def statuses(self) -> List[dict]:
+        """Status of every rover, with offline rovers reported rather than raised"""
+        rovers = list(self._rovers.values())
+        results = await asyncio.gather(*(rover.status() for rover in rovers), return_exceptions=True)
+        statuses = []
+        for rover, result in zip(rovers, results):
+            if isinstance(result, BaseException):
+                statuses.append({"rover_id": rover.rover_id, "online": False, "error": str(result) or type(result).__name__})
+            else:
+                statuses.append({**result, "rover_id": rover.rover_id, "online": True})
+        return statuses
+
+    async def events(self, limit: int = 50, event_type: Optional[str] = None) -> dict:
+        """Newest events across the fleet, merged by timestamp"""
+        rovers = list(self._rovers.values())
+        pages = await asyncio.gather(
+            *(rover.events(limit=limit, event_type=event_type) for rover in rovers),
+            return_exceptions=True
+        )
+        streams = []
+        errors = {}
+        for rover, page in zip(rovers, pages):
+            if isinstance(page, BaseException):
+                errors[rover.rover_id] = str(page) or type(page).__name__
+                continue
+            # Tag events with the registry id in case a rover misreports its own
+            streams.append([{**event, "rover_id": rover.rover_id} for event in page["events"]])
+        # Each page is newest first, so a lazy merge only looks at what it returns
+        merged = heapq.merge(*streams, key=lambda event: event["timestamp"], reverse=True)
+        return {
+            "events": [event for _, event in zip(range(limit), merged)],
+            "errors": errors
+        }
+
+
+def parse_fleet_config(value: str) -> Dict[int, str]:
+    """Remote rovers from ROVER_FLEET: a JSON file of {id: url} or "2=http://host:8000,3=..." """
+    if not value:
+        return {}
+    if os.path.isfile(value):
+        with open(value) as f:
+            return {int(rover_id): url for rover_id, url in json.load(f).items()}
+    remotes = {}
+    for entry in value.split(","):
+        rover_id, _, url = entry.strip().partition("=")
+        if not url:
+            raise ValueError(f"Invalid ROVER_FLEET entry: {entry!r} (expected id=url)")
+        remotes[int(rover_id)] = url
+    return remotes
@@ -0,0 +1,118 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import cv2
+import numpy as np
+
+
+class Frame:
+    """One camera frame with its JPEG encoding, each produced on first use.
+
+    A frame is created from whichever form arrives first: the raw image
+    from the camera or the JPEG bytes already encoded for the MJPEG stream.
+    The other form is derived once and cached, so every consumer of the
+    same frame shares a single encode or decode.
+    """
+
+    def __init__(self, seq: int, timestamp: float, image=None, jpeg: Optional[bytes] = None, quality: int = 90):
+        self.seq = seq
+        self.timestamp = timestamp
+        self._image = image
+        self._jpeg = jpeg
+        self._quality = quality
+        self._lock = threading.Lock()
+
+    @property
+    def image(self):
+        if self._image is None:
+            with self._lock:
+                if self._image is None and self._jpeg is not None:
+                    self._image = cv2.imdecode(np.frombuffer(self._jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+        return self._image
+
+    @property
+    def jpeg(self) -> Optional[bytes]:
+        if self._jpeg is None:
+            with self._lock:
+                if self._jpeg is None and self._image is not None:
+                    ok, encoded = cv2.imencode(".jpg", self._image, [cv2.IMWRITE_JPEG_QUALITY, self._quality])
+                    if ok:
+                        self._jpeg = encoded.tobytes()
+        return self._jpeg
+
+
+class FrameStore:
+    """Tracks the latest camera frame and numbers each new one.
+
+    Raw frames are read from capture_fn (vilib replaces its image array for
+    every frame rather than writing into it, so a new object means a new
+    frame). JPEG frames relayed from the video stream are published here as
+    well; while the stream is running and recent, its bytes are reused
+    instead of encoding the raw frame again.
+    """
+
+    def __init__(self, capture_fn: Callable[[], object], max_jpeg_age: float = 0.5, quality: int = 90):
+        self._capture = capture_fn
+        self.max_jpeg_age = max_jpeg_age
+        self.quality = quality
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._raw: Optional[Frame] = None  # latest frame read from the camera
+        self._streamed: Optional[Frame] = None  # latest frame relayed by the MJPEG stream
+
+    @property
+    def seq(self) -> int:
+        return self._seq
+
+    def latest(self) -> Optional[Frame]:
+        """Latest raw camera frame (None if the camera has not produced one)"""
+        image = self._capture()
+        with self._lock:
+            if image is None:
+                return self._raw
+            if self._raw is None or self._raw.image is not image:
+                self._seq += 1
+                self._raw = Frame(self._seq, time.time(), image=image, quality=self.quality)
+            return self._raw
+
+    def latest_encoded(self) -> Optional[Frame]:
+        """Latest frame, preferring one whose JPEG bytes already exist"""
+        with self._lock:
+            streamed = self._streamed
+        if streamed is not None and time.time() - streamed.timestamp <= self.max_jpeg_age:
+            return streamed
+        return self.latest()
+
+    def publish_jpeg(self, jpeg: bytes):
+        """Record a frame that was already encoded for the video stream"""
+        with self._lock:
+            self._seq += 1
+            self._streamed = Frame(self._seq, time.time(), jpeg=jpeg)
+
+
+class ImageCache:
+    """Small in-memory LRU of encoded images addressed by id"""
+
+    def __init__(self, capacity: int = 16):
+        self.capacity = capacity
+        self._images: OrderedDict = OrderedDict()  # image id -> JPEG bytes
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def add(self, data: bytes) -> int:
+        with self._lock:
+            image_id = self._next_id
+            self._next_id += 1
+            self._images[image_id] = data
+            while len(self._images) > self.capacity:
+                self._images.popitem(last=False)
+            return image_id
+
+    def get(self, image_id: int) -> Optional[bytes]:
+        with self._lock:
+            data = self._images.get(image_id)
+            if data is not None:
+                self._images.move_to_end(image_id)
+            return data
@@ -0,0 +1,17 @@
+"""Selects the Picarx/Vilib implementation the rover runs on.
+
+ROVER_BACKEND=hardware (the default) uses SunFounder's libraries on the
+Pi; ROVER_BACKEND=sim uses the simulator in rover_sim.py, so the whole
+stack can run and be load-tested on a development machine.
+"""
+import os
+
+BACKEND = os.environ.get("ROVER_BACKEND", "hardware").lower()
+
+if BACKEND == "sim":
+    from rover_sim import SimPicarx as Picarx, SimVilib as Vilib
+elif BACKEND == "hardware":
+    from picarx import Picarx
+    from vilib import Vilib  # Import sunfounder's video library
+else:
+    raise ValueError(f"Unknown ROVER_BACKEND: {BACKEND} (expected 'hardware' or 'sim')")
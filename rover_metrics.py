@@ -0,0 +1,304 @@
+import bisect
+import collections
+import functools
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Dict, List, Tuple
+
+# Set ROVER_METRICS=0 to turn instrumentation into no-ops
+ENABLED = os.environ.get("ROVER_METRICS", "1") != "0"
+
+# Latency buckets in seconds, from sensor reads up to slow model loads
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _NoopTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+class _Timer:
+    __slots__ = ("_series", "_start")
+
+    def __init__(self, series: "_HistogramSeries"):
+        self._series = series
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._series.observe(time.perf_counter() - self._start)
+        return False
+
+
+class _HistogramSeries:
+    """One labelled series of a histogram"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def time(self):
+        """Context manager that observes the duration of its block"""
+        return _Timer(self) if ENABLED else _NOOP_TIMER
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class _CounterSeries:
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._series: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        """The series for these label values, created on first use.
+
+        Hot paths should look their series up once and keep it.
+        """
+        key = tuple(str(labels[name]) for name in self.label_names)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    @abstractmethod
+    def _new_series(self):
+        """A fresh series for one set of label values"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._series.items())
+        for key, series in items:
+            lines.extend(self._render_series(key, series))
+        return lines
+
+    @abstractmethod
+    def _render_series(self, key, series) -> List[str]:
+        """Exposition lines for one series"""
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float, **labels):
+        if ENABLED:
+            self.labels(**labels).observe(value)
+
+    def time(self, **labels):
+        return self.labels(**labels).time() if ENABLED else _NOOP_TIMER
+
+    def _render_series(self, key, series) -> List[str]:
+        counts, total = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+        labels = _format_labels(self.label_names, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, amount: float = 1, **labels):
+        if ENABLED:
+            self.labels(**labels).inc(amount)
+
+    def _render_series(self, key, series) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(series.value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                # Modules may be imported more than once (e.g. by reloaders); share the series
+                if type(existing) is not type(metric) or existing.label_names != metric.label_names:
+                    raise ValueError(f"Metric {metric.name} is already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._metrics.pop(name, None)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def histogram(name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+
+def counter(name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))
+
+
+def timed(metric: Histogram, **labels):
+    """Decorator recording each call's duration in a histogram.
+
+    With metrics disabled the function is returned unwrapped.
+    """
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+        series = metric.labels(**labels)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                series.observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def render() -> str:
+    return REGISTRY.render()
+
+
+class SamplingProfiler:
+    """Samples every thread's stack on demand and aggregates them.
+
+    Stacks are read with sys._current_frames() from a separate thread at a
+    fixed interval, so nothing is traced between samples and the profiled
+    code runs unmodified. The result is in collapsed-stack format ("thread;
+    outer;...;inner count" per line), which flamegraph.pl and speedscope
+    read directly. Only one profile runs at a time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def profile(self, duration: float, interval: float = 0.005) -> Future:
+        """Start sampling for duration seconds; the future resolves to the collapsed stacks"""
+        with self._lock:
+            if self._running:
+                raise RuntimeError("A profile is already running")
+            self._running = True
+        future = Future()
+        threading.Thread(
+            target=self._run, args=(future, duration, interval), name="sampling-profiler", daemon=True
+        ).start()
+        return future
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+    def _run(self, future: Future, duration: float, interval: float):
+        try:
+            own = threading.get_ident()
+            stacks = collections.Counter()
+            samples = 0
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(self._frame_label(frame))
+                        frame = frame.f_back
+                    labels.append(names.get(ident, f"thread-{ident}"))
+                    stacks[";".join(reversed(labels))] += 1
+                samples += 1
+                time.sleep(interval)
+            lines = [f"{stack} {count}" for stack, count in stacks.most_common()]
+            future.set_result({"samples": samples, "collapsed": "\n".join(lines) + "\n"})
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._running = False
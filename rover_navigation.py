@@ -0,0 +1,57 @@
+from typing import Dict, List, Optional
+
+# Classes given a wider berth than other detections
+CLASS_WEIGHTS: Dict[str, float] = {
+    "person": 1.5,
+    "dog": 1.5,
+    "cat": 1.5,
+}
+
+
+def detection_obstacles(
+    objects: List[dict],
+    frame_size: List[int],
+    min_height: float = 0.2,
+    class_weights: Optional[Dict[str, float]] = None
+) -> List[dict]:
+    """Detections that look close enough to steer around
+
+    Box height relative to the frame stands in for proximity. Each obstacle
+    gets its horizontal center in [-1, 1] (negative is left) and a weight
+    that grows with its size, its class weight and how close it is to the
+    middle of the path.
+    """
+    class_weights = CLASS_WEIGHTS if class_weights is None else class_weights
+    width, height = frame_size
+    obstacles = []
+    for obj in objects:
+        x, y, w, h = obj["box"]
+        size = h / height
+        if size < min_height:
+            continue
+        center = (x + w / 2) / width * 2 - 1
+        in_path = max(0.0, 1.0 - abs(center))
+        obstacles.append({
+            "class": obj["class"],
+            "center": center,
+            "weight": size * in_path * class_weights.get(obj["class"], 1.0)
+        })
+    return obstacles
+
+
+def steer_away(obstacles: List[dict], max_angle: float, full_weight: float = 0.5) -> Optional[float]:
+    """Steering angle away from the weighted obstacle position
+
+    Returns None when nothing is in the way. The angle grows with the total
+    obstacle weight and saturates at max_angle once it reaches full_weight.
+    Obstacles dead ahead are passed on the right, the way the rover turns
+    when only the ultrasonic sensor sees something.
+    """
+    total = sum(obstacle["weight"] for obstacle in obstacles)
+    if total <= 0:
+        return None
+    position = sum(obstacle["center"] * obstacle["weight"] for obstacle in obstacles) / total
+    magnitude = max_angle * min(1.0, total / full_weight)
+    # Positive angles steer right, so steer against the side the obstacles are on
+    direction = -1.0 if position > 0.05 else 1.0
+    return direction * magnitude
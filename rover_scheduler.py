@@ -0,0 +1,136 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+import rover_metrics
+
+CONTROL_STEP_SECONDS = rover_metrics.histogram("rover_control_step_seconds", "Control loop step duration", ("loop",))
+CONTROL_LATENESS_SECONDS = rover_metrics.histogram(
+    "rover_control_lateness_seconds", "How late control loop deadline ticks start", ("loop",)
+)
+CONTROL_OVERRUNS = rover_metrics.counter(
+    "rover_control_overruns_total", "Control loop steps that ran past the next deadline", ("loop",)
+)
+
+
+class ControlLoop:
+    """Runs a step function at a fixed rate against absolute deadlines.
+
+    Each tick is scheduled from the previous deadline rather than from when
+    the last step finished, so step time does not stretch the period. When
+    wait_fn is given, the loop waits through it instead of sleeping; it
+    returns True when new input (e.g. a sensor sample) has arrived, and the
+    step runs immediately instead of waiting for the next deadline.
+
+    Lateness of deadline ticks (jitter) and step durations are recorded, and
+    a step that runs past the following deadline counts as an overrun; the
+    missed deadlines are skipped rather than run back to back.
+    """
+
+    def __init__(
+        self,
+        step_fn: Callable[[float], None],
+        rate: float = 50.0,
+        wait_fn: Optional[Callable[[float], bool]] = None,
+        history: int = 1000,
+        name: str = "control"
+    ):
+        self._step = step_fn
+        self.period = 1.0 / rate
+        self._wait = wait_fn
+        self.name = name
+        self._lateness: deque = deque(maxlen=history)  # seconds past the deadline, per deadline tick
+        self._durations: deque = deque(maxlen=history)  # seconds spent in step_fn
+        self._shutdown_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.ticks = 0
+        self.input_ticks = 0  # ticks triggered early by new input
+        self.overruns = 0
+        self.errors = 0
+        self._step_seconds = CONTROL_STEP_SECONDS.labels(loop=name)
+        self._lateness_seconds = CONTROL_LATENESS_SECONDS.labels(loop=name)
+
+    @property
+    def rate(self) -> float:
+        return 1.0 / self.period
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._shutdown_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-loop", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._shutdown_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> dict:
+        lateness = sorted(self._lateness)
+        durations = list(self._durations)
+
+        def ms(value: float) -> float:
+            return round(value * 1000, 3)
+
+        return {
+            "rate": self.rate,
+            "ticks": self.ticks,
+            "input_ticks": self.input_ticks,
+            "overruns": self.overruns,
+            "errors": self.errors,
+            "jitter_ms": {
+                "mean": ms(sum(lateness) / len(lateness)) if lateness else 0.0,
+                "p99": ms(lateness[int(len(lateness) * 0.99)]) if lateness else 0.0,
+                "max": ms(lateness[-1]) if lateness else 0.0
+            },
+            "step_ms": {
+                "mean": ms(sum(durations) / len(durations)) if durations else 0.0,
+                "max": ms(max(durations)) if durations else 0.0
+            }
+        }
+
+    def _tick(self, now: float):
+        try:
+            self._step(now)
+        except Exception as e:
+            self.errors += 1
+            print(f"{self.name} loop error: {str(e)}")  # Console logging
+        self.ticks += 1
+        duration = time.monotonic() - now
+        self._durations.append(duration)
+        if rover_metrics.ENABLED:
+            self._step_seconds.observe(duration)
+
+    def _run(self):
+        deadline = time.monotonic() + self.period
+        while not self._shutdown_event.is_set():
+            timeout = deadline - time.monotonic()
+            if timeout > 0:
+                if self._wait is not None:
+                    woke = self._wait(timeout)
+                else:
+                    woke = False
+                    self._shutdown_event.wait(timeout)
+                if self._shutdown_event.is_set():
+                    break
+                if woke:
+                    # New input: react now and keep the current deadline
+                    self.input_ticks += 1
+                    self._tick(time.monotonic())
+                    continue
+
+            now = time.monotonic()
+            lateness = max(0.0, now - deadline)
+            self._lateness.append(lateness)
+            if rover_metrics.ENABLED:
+                self._lateness_seconds.observe(lateness)
+            self._tick(now)
+
+            deadline += self.period
+            if time.monotonic() > deadline:
+                self.overruns += 1
+                CONTROL_OVERRUNS.inc(loop=self.name)
+                deadline = time.monotonic() + self.period
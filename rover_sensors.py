@@ -0,0 +1,120 @@
+import itertools
+import statistics
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Optional, Tuple
+
+import rover_metrics
+
+SENSOR_READ_SECONDS = rover_metrics.histogram("rover_sensor_read_seconds", "Sensor read latency", ("sensor",))
+SENSOR_READ_ERRORS = rover_metrics.counter("rover_sensor_read_errors_total", "Failed sensor reads", ("sensor",))
+
+
+class SensorSampler:
+    """Reads a sensor at a fixed rate on its own thread and caches the readings.
+
+    Readings are kept as (timestamp, value) pairs in a ring buffer, so
+    consumers get the latest or median-filtered value as a memory read
+    instead of blocking on the sensor. Negative values (the ultrasonic
+    driver's timeout/error codes) are kept in the history but ignored by
+    the filter, as are readings older than max_age seconds, so a sensor
+    that stops answering reads as no value rather than its last good one.
+    """
+
+    def __init__(
+        self,
+        read_fn: Callable[[], float],
+        interval: float = 0.05,
+        history: int = 200,
+        median_window: int = 3,
+        max_age: Optional[float] = None,
+        name: str = "sensor"
+    ):
+        self._read = read_fn
+        self.interval = interval
+        self.median_window = median_window
+        self.max_age = max_age if max_age is not None else 5 * interval
+        self.name = name
+        self._readings: deque = deque(maxlen=history)
+        self._condition = threading.Condition()
+        self._shutdown_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.seq = 0  # number of readings taken so far
+        self.errors = 0
+        self._read_seconds = SENSOR_READ_SECONDS.labels(sensor=name)
+
+    def start(self):
+        """Take a first reading synchronously, then keep sampling in the background"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._shutdown_event.clear()
+        self._sample()
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 1.0):
+        self._shutdown_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def latest(self) -> Optional[Tuple[float, float]]:
+        """Most recent (timestamp, value) reading"""
+        with self._condition:
+            return self._readings[-1] if self._readings else None
+
+    def filtered(self) -> Optional[float]:
+        """Median of the most recent valid readings (None if none are fresh)"""
+        oldest = time.time() - self.max_age
+        with self._condition:
+            recent = [
+                value for timestamp, value in itertools.islice(reversed(self._readings), self.median_window)
+                if value >= 0 and timestamp >= oldest
+            ]
+        if not recent:
+            return None
+        return statistics.median(recent)
+
+    def readings(self, since: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Buffered (timestamp, value) readings, optionally only those after a timestamp"""
+        with self._condition:
+            readings = list(self._readings)
+        if since is not None:
+            readings = [reading for reading in readings if reading[0] > since]
+        return readings
+
+    def wait_for_sample(self, after_seq: int, timeout: float) -> bool:
+        """Block until a reading newer than after_seq arrives; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self.seq > after_seq or self._shutdown_event.is_set(),
+                timeout
+            ) and self.seq > after_seq
+
+    def _sample(self):
+        try:
+            with self._read_seconds.time():
+                value = float(self._read())
+        except Exception as e:
+            self.errors += 1
+            SENSOR_READ_ERRORS.inc(sensor=self.name)
+            print(f"{self.name} read error: {str(e)}")  # Console logging
+            return
+        with self._condition:
+            self._readings.append((time.time(), value))
+            self.seq += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        # Schedule against absolute deadlines so slow reads don't stretch the period
+        next_sample = time.monotonic() + self.interval
+        while not self._shutdown_event.is_set():
+            delay = next_sample - time.monotonic()
+            if delay > 0 and self._shutdown_event.wait(delay):
+                break
+            self._sample()
+            next_sample += self.interval
+            if next_sample < time.monotonic():
+                next_sample = time.monotonic() + self.interval
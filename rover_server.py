@@ -1,24 +1,139 @@
-from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
+from fastapi import FastAPI, Request, Query, WebSocket, WebSocketDisconnect
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse, StreamingResponse
+from fastapi.responses import HTMLResponse, StreamingResponse, Response, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
 import uvicorn
-from rover_controller import RoverController
+from rover_controller import RoverController, Constants
+from rover_telemetry import TelemetryBroadcaster
+from rover_commands import CommandChannel
+from rover_fleet import Fleet, LocalRover, RemoteRover, parse_fleet_config
+from rover_stream import MJPEGBroadcaster, VideoStreamHub, StreamProfile, MJPEG_BOUNDARY, mjpeg_part
+import rover_metrics
+from rover_static import PrecompressedStaticFiles, VolatileStaticFiles, cached_response
 import signal
 import sys
 import requests
 import aiohttp
+import asyncio
 import io
+import json
+import math
+import os
+import time
+import contextlib
+from contextlib import asynccontextmanager
 
-app = FastAPI()
-templates = Jinja2Templates(directory="templates")
-app.mount("/static", StaticFiles(directory="static"), name="static")
+VIDEO_UPSTREAM_URL = os.environ.get("ROVER_VIDEO_URL", "http://localhost:9000/mjpg")
+SERVER_PORT = int(os.environ.get("ROVER_PORT", 8000))
+# The sampling profiler exposes every thread's stack, so it is opt-in
+PROFILER_ENABLED = os.environ.get("ROVER_PROFILER", "0") == "1"
+
+HTTP_REQUEST_SECONDS = rover_metrics.histogram(
+    "rover_http_request_seconds", "Time until the response starts, per route", ("method", "route", "status")
+)
+profiler = rover_metrics.SamplingProfiler()
+
+# This server's own rover; give each rover a distinct id and name when running a fleet
+ROVER_ID = int(os.environ.get("ROVER_ID", 1))
+ROVER_NAME = os.environ.get("ROVER_NAME", f"rover_{ROVER_ID}")
+ROVER_EVENT_LOG_DIR = os.environ.get("ROVER_EVENT_LOG_DIR", Constants.EVENT_LOG_DIR)
+ROVER_SNAPSHOTS_DIR = os.environ.get("ROVER_SNAPSHOTS_DIR", "static/snapshots")
+
+rover = RoverController.get_instance(
+    rover_id=ROVER_ID,
+    rover_name=ROVER_NAME,
+    event_log_dir=ROVER_EVENT_LOG_DIR,
+    snapshots_dir=ROVER_SNAPSHOTS_DIR
+)
+
+# One pooled HTTP session shared by all outgoing requests
+http_session: Optional[aiohttp.ClientSession] = None
+
+def get_http_session() -> aiohttp.ClientSession:
+    global http_session
+    if http_session is None or http_session.closed:
+        http_session = aiohttp.ClientSession()
+    return http_session
+
+# Every rover this gateway can reach: the local one plus any remotes listed in ROVER_FLEET
+fleet = Fleet()
+fleet.add(LocalRover(rover))
+for remote_id, remote_url in parse_fleet_config(os.environ.get("ROVER_FLEET", "")).items():
+    fleet.add(RemoteRover(remote_id, remote_url, get_http_session))
+
+# A single upstream connection to vilib feeds every /video_feed client,
+# with one shared re-encoder per distinct stream profile. Its JPEGs are also
+# handed to the frame store so snapshots can save them without re-encoding.
+video_broadcaster = MJPEGBroadcaster(VIDEO_UPSTREAM_URL, get_http_session, on_frame=rover.frames.publish_jpeg)
+video_hub = VideoStreamHub(video_broadcaster)
+
+# Pushes the controller's sampled status and events to /ws/telemetry clients
+telemetry = TelemetryBroadcaster(rover)
+
+# Applies /ws/control commands, keeping only the latest per actuator
+commands = CommandChannel(
+    rover,
+    deadman_timeout=Constants.COMMAND_DEADMAN_TIMEOUT,
+    latch_timeout=Constants.COMMAND_LATCH_TIMEOUT
+)
+COMMAND_PING_INTERVAL = 1.0
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the camera and detection model in the background so the server binds immediately;
+    # /api/status reports vision_state until it is ready
+    rover.start_vision_warmup()
+    telemetry.attach(asyncio.get_running_loop())
+    commands.start()
+    # Compress static assets off the event loop; they are served uncompressed until then
+    static_files.warm_up()
+    yield
+    static_files.close()
+    commands.stop()
+    telemetry.detach()
+    await video_hub.close()
+    if http_session is not None:
+        await http_session.close()
+
+app = FastAPI(lifespan=lifespan)
+
+
+class RequestMetricsMiddleware:
+    """Records the time until each HTTP response starts, labelled by route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not rover_metrics.ENABLED:
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                # The route template rather than the raw path, so ids don't multiply the series
+                route = scope.get("route")
+                HTTP_REQUEST_SECONDS.observe(
+                    time.perf_counter() - start,
+                    method=scope["method"],
+                    route=route.path if route is not None else "other",
+                    status=message["status"]
+                )
+            await send(message)
+
+        await self.app(scope, receive, send_with_timing)
 
-# Get the singleton instance
-rover = RoverController.get_instance()
-rover.initialize_vision()
+app.add_middleware(RequestMetricsMiddleware)
+
+templates = Jinja2Templates(directory="templates")
+# Assets are indexed at startup and linked with content-hash URLs from the template
+static_files = PrecompressedStaticFiles("static", prefix="/static")
+templates.env.globals["static_url"] = static_files.url
+# Snapshots keep their /static/snapshots URLs wherever ROVER_SNAPSHOTS_DIR puts them
+app.mount("/static/snapshots", VolatileStaticFiles(directory=ROVER_SNAPSHOTS_DIR), name="snapshots")
+app.mount("/static", static_files, name="static")
 
 
 class CameraCommand(BaseModel):
@@ -28,6 +143,10 @@ class CameraCommand(BaseModel):
 class ModeCommand(BaseModel):
     mode: str
 
+class DetectionStreamCommand(BaseModel):
+    enabled: bool
+    interval: Optional[float] = None
+
 @app.get("/", response_class=HTMLResponse)
 async def root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
@@ -37,59 +156,328 @@ async def get_status():
     return rover.get_status()
 
 @app.get("/api/events")
-async def get_events(start: int = 0, limit: int = 50):
-    events = rover.event_buffer.get_events(start, limit)
-    total = rover.event_buffer.get_total_events()
+async def get_events(
+    start: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    event_type: Optional[str] = None,
+    before: Optional[int] = None,
+    since: Optional[int] = None,
+    from_time: Optional[float] = Query(None, alias="from"),
+    to_time: Optional[float] = Query(None, alias="to"),
+    cursor: Optional[str] = None
+):
+    """Get events newest first
+
+    Page with start/limit offsets, or with seq cursors: pass the previous
+    page's next_before as before for older events, or the latest seq seen
+    as since for newer ones. Passing from/to (Unix timestamps) instead
+    queries the persistent event log, oldest first; pass its next_cursor
+    as cursor to continue.
+    """
+    if from_time is not None or to_time is not None or cursor is not None:
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                None, rover.event_log.query, from_time, to_time, limit, event_type, cursor
+            )
+        except ValueError as e:
+            return {"success": False, "error": str(e)}
     
-    # Events are already dicts, no need to convert
-    return {
-        "events": events,  # events are already converted to dicts in get_events()
-        "total": total,
-        "has_more": (start + limit) < total
-    }
+    # Events are already dicts with the pagination cursors alongside
+    return rover.event_buffer.get_page(start, limit, event_type, before, since)
+
+@app.get("/api/telemetry")
+async def get_telemetry(
+    from_time: Optional[float] = Query(None, alias="from"),
+    to_time: Optional[float] = Query(None, alias="to"),
+    downsample: Optional[float] = Query(None, gt=0)
+):
+    """Get recorded status history between from/to (Unix timestamps)
+
+    Fields are returned as parallel arrays. downsample averages samples
+    into buckets of that many seconds.
+    """
+    return rover.telemetry_history.query(from_time, to_time, downsample)
+
+@app.websocket("/ws/telemetry")
+async def telemetry_socket(websocket: WebSocket):
+    """Push status changes and new events as they are sampled"""
+    await websocket.accept()
+    queue = telemetry.subscribe()
+    try:
+        await websocket.send_json(await telemetry.snapshot())
+        while True:
+            await websocket.send_json(await queue.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        telemetry.unsubscribe(queue)
+
+@app.websocket("/ws/control")
+async def control_socket(websocket: WebSocket):
+    """Low-latency manual control
+
+    Clients send JSON commands, each acknowledged with its seq:
+      {"type": "drive", "seq": 1, "speed": 20, "steer": -10}  (repeat to keep driving)
+      {"type": "move", "seq": 2, "command": "forward"}
+      {"type": "camera", "seq": 3, "pan": 10, "tilt": 0}
+    The server pings every second; clients echo the ping's t in a pong, and
+    the measured round trip is reported back in the next ping as rtt_ms.
+    """
+    await websocket.accept()
+    rtt_ms = None
+    # The ping task and the ack replies share the socket; only one may write at a time
+    send_lock = asyncio.Lock()
+
+    async def send(message: dict):
+        async with send_lock:
+            await websocket.send_json(message)
+
+    async def ping():
+        while True:
+            await send({"type": "ping", "t": time.monotonic(), "rtt_ms": rtt_ms})
+            await asyncio.sleep(COMMAND_PING_INTERVAL)
+
+    ping_task = asyncio.create_task(ping())
+    try:
+        while True:
+            frame = await websocket.receive()
+            if frame["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(frame.get("code", 1000))
+            commands.heartbeat()
+            # Text or binary frames, both carrying UTF-8 JSON
+            data = frame.get("text")
+            if data is None:
+                data = frame.get("bytes")
+            try:
+                message = json.loads(data) if data is not None else None
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                await send({"type": "ack", "seq": None, "ok": False, "error": "Invalid command: expected a JSON object"})
+                continue
+
+            kind = message.get("type")
+            ack = {"type": "ack", "seq": message.get("seq"), "ok": True}
+            try:
+                if kind == "pong":
+                    rtt = (time.monotonic() - float(message["t"])) * 1000
+                    if not math.isfinite(rtt) or rtt < 0:
+                        raise ValueError(f"Invalid pong time: {message['t']}")
+                    rtt_ms = rtt
+                    commands.record_rtt(rtt_ms)
+                    continue
+                if kind == "drive":
+                    ack["ok"] = rover.mode == "manual"
+                    commands.drive(float(message.get("speed", 0)), float(message.get("steer", 0)))
+                elif kind == "move":
+                    ack["ok"] = rover.mode == "manual"
+                    commands.move(str(message["command"]))
+                elif kind == "camera":
+                    pan, tilt = message.get("pan"), message.get("tilt")
+                    commands.camera(None if pan is None else float(pan), None if tilt is None else float(tilt))
+                else:
+                    ack.update(ok=False, error=f"Unknown command type: {kind}")
+            except (KeyError, TypeError, ValueError, OverflowError) as e:
+                ack.update(ok=False, error=f"Invalid command: {str(e)}")
+            if not ack["ok"] and "error" not in ack:
+                ack["error"] = "Not in manual mode"
+            await send(ack)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        ping_task.cancel()
+        # Retrieve the task's outcome, which is a failed send if the peer went away first
+        with contextlib.suppress(asyncio.CancelledError, WebSocketDisconnect, RuntimeError):
+            await ping_task
+        # Never leave the rover driving on a stream that has gone away
+        commands.release()
+
+@app.get("/api/commands/stats")
+async def command_stats():
+    """Get command channel counters and round-trip latency"""
+    return commands.stats()
+
+async def call_rover(rover_id: int, action):
+    """Run action(rover) against a fleet rover, reporting unknown or unreachable rovers"""
+    target = fleet.get(rover_id)
+    if target is None:
+        return {"success": False, "error": f"Unknown rover: {rover_id}"}
+    try:
+        return await action(target)
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        return {"success": False, "error": f"Rover {rover_id} unreachable: {str(e) or type(e).__name__}"}
+
+@app.get("/api/rovers")
+async def get_rovers():
+    """Status of every rover in the fleet"""
+    return {"rovers": await fleet.statuses()}
+
+@app.get("/api/rovers/events")
+async def get_fleet_events(
+    limit: int = Query(50, ge=1, le=1000),
+    event_type: Optional[str] = None
+):
+    """Newest events across the fleet; errors lists rovers that could not be reached"""
+    return await fleet.events(limit, event_type)
+
+@app.get("/api/rovers/{rover_id}/status")
+async def get_rover_status(rover_id: int):
+    return await call_rover(rover_id, lambda target: target.status())
+
+@app.get("/api/rovers/{rover_id}/events")
+async def get_rover_events(
+    rover_id: int,
+    start: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    event_type: Optional[str] = None,
+    before: Optional[int] = None,
+    since: Optional[int] = None
+):
+    return await call_rover(rover_id, lambda target: target.events(start=start, limit=limit, event_type=event_type, before=before, since=since))
+
+@app.post("/api/rovers/{rover_id}/control/{command}")
+async def control_fleet_rover(rover_id: int, command: str):
+    return await call_rover(rover_id, lambda target: target.control(command))
+
+@app.post("/api/rovers/{rover_id}/camera")
+async def control_fleet_camera(rover_id: int, command: CameraCommand):
+    return await call_rover(rover_id, lambda target: target.camera(command.pan, command.tilt))
+
+@app.post("/api/rovers/{rover_id}/mode")
+async def set_fleet_rover_mode(rover_id: int, command: ModeCommand):
+    return await call_rover(rover_id, lambda target: target.set_mode(command.mode))
+
+@app.post("/api/rovers/{rover_id}/snapshot")
+async def take_fleet_snapshot(rover_id: int):
+    return await call_rover(rover_id, lambda target: target.snapshot())
+
+@app.post("/api/rovers/{rover_id}/analyze")
+async def analyze_fleet_view(rover_id: int):
+    return await call_rover(rover_id, lambda target: target.analyze())
 
 @app.post("/api/control/{command}")
 async def control_rover(command: str):
-    success = rover.handle_movement_command(command)
+    # Servo writes and event logging; keep them off the event loop
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(None, rover.handle_movement_command, command)
     return {"success": success}
 
 @app.post("/api/camera")
 async def control_camera(command: CameraCommand):
-    success = rover.handle_camera_command(command.pan, command.tilt)
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(None, rover.handle_camera_command, command.pan, command.tilt)
     return {"success": success}
 
 @app.post("/api/mode")
 async def set_mode(command: ModeCommand):
-    success = rover.set_mode(command.mode)
+    # Mode changes write the servos and start or stop the detection stream; keep them off the event loop
+    loop = asyncio.get_running_loop()
+    success = await loop.run_in_executor(None, rover.set_mode, command.mode)
     return {"success": success}
 
+@app.get("/api/control-loop")
+async def get_control_loop():
+    """Get autonomous control loop timing statistics"""
+    return {"drive_state": rover.drive_state, **rover.control_loop.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Timing histograms and counters in the Prometheus text format"""
+    return PlainTextResponse(rover_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/api/profile", response_class=PlainTextResponse)
+async def run_profile(
+    seconds: float = Query(5.0, gt=0, le=60),
+    interval_ms: float = Query(5.0, ge=1, le=1000)
+):
+    """Sample all thread stacks for a while and return them in collapsed-stack format"""
+    if not PROFILER_ENABLED:
+        return PlainTextResponse("Profiler disabled (set ROVER_PROFILER=1)\n", status_code=403)
+    try:
+        future = profiler.profile(seconds, interval_ms / 1000)
+    except RuntimeError as e:
+        return PlainTextResponse(f"{str(e)}\n", status_code=409)
+    result = await asyncio.wrap_future(future)
+    return PlainTextResponse(result["collapsed"], headers={"X-Profile-Samples": str(result["samples"])})
+
 @app.post("/api/snapshot")
 async def take_snapshot():
-    return rover.take_snapshot()
+    return await asyncio.wrap_future(rover.capture_snapshot())
+
+@app.post("/api/snapshot/burst")
+async def take_snapshot_burst(
+    count: int = Query(5, ge=1, le=20),
+    interval: float = Query(0.2, ge=0.05, le=5.0)
+):
+    """Capture count frames interval seconds apart"""
+    futures = []
+    for i in range(count):
+        if i:
+            await asyncio.sleep(interval)
+        futures.append(asyncio.wrap_future(rover.capture_snapshot()))
+    results = await asyncio.gather(*futures)
+    return {
+        "success": any(result["success"] for result in results),
+        "snapshots": results
+    }
 
 @app.get("/api/snapshots")
 async def get_snapshots():
     return {"snapshots": rover.get_snapshots()}
 
 @app.get("/video_feed")
-async def video_feed():
-    """Proxy the vilib video feed"""
+async def video_feed(
+    fps: Optional[float] = Query(None, gt=0, le=60),
+    scale: float = Query(1.0, gt=0, le=1.0),
+    quality: Optional[int] = Query(None, ge=10, le=95),
+    auto: bool = False
+):
+    """Proxy the vilib video feed
+
+    fps, scale and quality select a reduced stream profile; auto adapts the
+    profile to how fast the client drains frames.
+    """
+    if auto:
+        frames = video_hub.adaptive_frames()
+    else:
+        frames = video_hub.frames(StreamProfile(max_fps=fps, scale=scale, quality=quality))
+
     async def video_stream():
-        async with aiohttp.ClientSession() as session:
-            async with session.get("http://localhost:9000/mjpg") as response:
-                async for chunk in response.content.iter_chunked(8192):
-                    yield chunk
+        try:
+            async for frame in frames:
+                yield mjpeg_part(frame)
+        finally:
+            await frames.aclose()
 
     return StreamingResponse(
         video_stream(),
-        media_type="multipart/x-mixed-replace; boundary=frame"
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
     )
 
+@app.get("/api/video/stats")
+async def video_stats():
+    """Get video fan-out statistics"""
+    return video_hub.stats()
+
 @app.post("/api/analyze")
-async def analyze_view():
-    """Analyze the current camera view for objects and colors"""
+async def analyze_view(full: bool = False):
+    """Analyze the current camera view for objects and colors
+
+    Unchanged scenes return the previous result and localized changes are
+    only re-detected in the changed region; full=true analyzes the whole
+    frame regardless.
+    """
     try:
-        result = rover.analyze_current_view()
+        # While streaming, the background pipeline already has a fresh result
+        if rover.detection_stream_active and not full:
+            latest = rover.get_latest_detection()
+            if latest is not None:
+                return latest
+        
+        # Inference runs on the detection worker; await it without blocking the event loop
+        job = rover.submit_analysis(full=full)
+        result = await asyncio.wrap_future(job.future)
         return result  # FastAPI will automatically convert this to JSON
     except Exception as e:
         return {
@@ -97,6 +485,60 @@ async def analyze_view():
             'error': str(e)
         }
 
+@app.get("/api/analysis/images/{image_id}.jpg")
+async def get_analysis_image(image_id: int, request: Request):
+    """Annotated image of a recent analysis, kept in memory"""
+    data = rover.analysis_images.get(image_id)
+    if data is None:
+        return Response(status_code=404)
+    # An id's image never changes, but it is evicted once newer analyses push it out,
+    # so clients keep it briefly and then check it is still there
+    return cached_response(
+        request.headers, data, "image/jpeg", f'"analysis-{image_id}"', "private, max-age=60, must-revalidate"
+    )
+
+@app.post("/api/analyze/jobs")
+async def create_analysis_job():
+    """Queue an analysis of the current view and return its job id"""
+    try:
+        job = rover.submit_analysis()
+        return {"success": True, "job_id": job.job_id}
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }
+
+@app.get("/api/analyze/jobs/{job_id}")
+async def get_analysis_job(job_id: int):
+    """Get the status and result of a queued analysis"""
+    job = rover.detection_worker.get_job(job_id) if rover.detection_worker else None
+    if job is None:
+        return {"success": False, "error": f"Unknown analysis job: {job_id}"}
+    return {"success": True, **job.to_dict()}
+
+@app.get("/api/detections/latest")
+async def get_latest_detection():
+    """Get the most recent detection result without running inference"""
+    latest = rover.get_latest_detection()
+    if latest is None:
+        return {'success': False, 'error': 'No detections available yet'}
+    return latest
+
+@app.post("/api/detections/stream")
+async def set_detection_stream(command: DetectionStreamCommand):
+    """Start or stop continuous background detection"""
+    if command.enabled:
+        success = rover.start_detection_stream(command.interval)
+    else:
+        rover.stop_detection_stream()
+        success = True
+    return {
+        "success": success,
+        "active": rover.detection_stream_active,
+        "interval": rover.detection_stream_interval
+    }
+
 def signal_handler(signum, frame):
     print("\nShutting down gracefully...")
     rover.cleanup()
@@ -112,7 +554,7 @@ def start_server():
     threading.Thread(target=rover.start, daemon=True).start()
     
     # Start web server
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(app, host="0.0.0.0", port=SERVER_PORT)
 
 if __name__ == "__main__":
     start_server() 
\ No newline at end of file
@@ -0,0 +1,490 @@
+"""Hardware-free stand-ins for the SunFounder Picarx and Vilib libraries.
+
+Selected with ROVER_BACKEND=sim (see rover_hardware.py). The rover drives
+around a simulated room of round obstacles: motor and steering commands
+move it with a simple bicycle model, the ultrasonic sensor ray-casts
+into the room, and the camera renders a first-person view of the
+obstacles (or plays a video file) and serves it as MJPEG on port 9000
+like vilib does. SimDetector stands in for the YOLO model, so object
+detection works without model files.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+from rover_detection import DetectorBackend
+
+
+@dataclass
+class Obstacle:
+    x: float  # cm
+    y: float
+    radius: float
+    height: float = 40.0
+    color: tuple = (60, 60, 200)  # BGR
+
+
+@dataclass
+class SimConfig:
+    room_width: float = 400.0  # cm
+    room_height: float = 300.0
+    obstacle_count: int = 6
+    seed: Optional[int] = None
+    world_file: Optional[str] = None  # JSON with room size and obstacles
+    sensor_latency: float = 0.005  # seconds per ultrasonic read
+    sensor_noise: float = 1.0  # cm (standard deviation)
+    sensor_range: float = 300.0  # cm
+    speed_scale: float = 1.0  # cm/s of travel per percent of motor speed
+    wheelbase: float = 10.0  # cm
+    fps: float = 30.0
+    width: int = 640
+    height: int = 480
+    video: Optional[str] = None  # play this file instead of rendering the world
+    stream_port: int = 9000
+    inference_latency: float = 0.0  # extra seconds per simulated detection, to mimic a real model
+    obstacles: List[Obstacle] = field(default_factory=list)
+
+    @classmethod
+    def from_env(cls) -> "SimConfig":
+        """Build a config from ROVER_SIM_* environment variables"""
+        env = os.environ
+        seed = env.get("ROVER_SIM_SEED")
+        config = cls(
+            obstacle_count=int(env.get("ROVER_SIM_OBSTACLES", cls.obstacle_count)),
+            seed=int(seed) if seed else None,
+            world_file=env.get("ROVER_SIM_WORLD"),
+            sensor_latency=float(env.get("ROVER_SIM_SENSOR_LATENCY", cls.sensor_latency)),
+            sensor_noise=float(env.get("ROVER_SIM_SENSOR_NOISE", cls.sensor_noise)),
+            fps=float(env.get("ROVER_SIM_FPS", cls.fps)),
+            video=env.get("ROVER_SIM_VIDEO"),
+            stream_port=int(env.get("ROVER_SIM_STREAM_PORT", cls.stream_port)),
+            inference_latency=float(env.get("ROVER_SIM_INFERENCE_LATENCY", cls.inference_latency)),
+        )
+        resolution = env.get("ROVER_SIM_RESOLUTION")
+        if resolution:
+            width, _, height = resolution.lower().partition("x")
+            config.width = int(width)
+            config.height = int(height or width)
+        return config
+
+
+class SimWorld:
+    """Room, obstacles and rover pose, integrated lazily on each access.
+
+    Instead of running a physics thread, every read or command first
+    advances the simulation to the current time in fixed substeps using
+    the motor command that was in effect.
+    """
+
+    STEP = 0.01  # seconds per integration substep
+
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.width = config.room_width
+        self.height = config.room_height
+        self.obstacles = list(config.obstacles)
+        if config.world_file:
+            self._load(config.world_file)
+        elif not self.obstacles:
+            self._generate(random.Random(config.seed))
+        self.x = self.width / 2
+        self.y = self.height / 2
+        self.heading = 0.0  # radians, 0 points along +x
+        self.speed = 0.0  # motor percent, negative reverses
+        self.steering = 0.0  # degrees, positive turns right
+        self.camera_pan = 0.0  # degrees, turns the rendered view
+        self.collisions = 0
+        self.distance_travelled = 0.0
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _load(self, path: str):
+        with open(path) as f:
+            world = json.load(f)
+        self.width = world.get("width", self.width)
+        self.height = world.get("height", self.height)
+        self.obstacles = [Obstacle(**obstacle) for obstacle in world.get("obstacles", [])]
+
+    def _generate(self, rng: random.Random):
+        # Keep the middle of the room, where the rover starts, clear
+        while len(self.obstacles) < self.config.obstacle_count:
+            x = rng.uniform(20, self.width - 20)
+            y = rng.uniform(20, self.height - 20)
+            if math.hypot(x - self.width / 2, y - self.height / 2) < 60:
+                continue
+            color = (rng.randint(40, 220), rng.randint(40, 220), rng.randint(40, 220))
+            self.obstacles.append(Obstacle(x, y, rng.uniform(8, 25), rng.uniform(20, 80), color))
+
+    def command(self, speed: Optional[float] = None, steering: Optional[float] = None):
+        with self._lock:
+            self._advance()
+            if speed is not None:
+                self.speed = speed
+            if steering is not None:
+                self.steering = steering
+
+    def _advance(self):
+        # Caller holds the lock
+        now = time.monotonic()
+        elapsed = min(now - self._last, 1.0)  # don't teleport after a long pause
+        self._last = now
+        velocity = self.speed * self.config.speed_scale
+        while elapsed > 0 and velocity:
+            dt = min(self.STEP, elapsed)
+            elapsed -= dt
+            step = velocity * dt
+            heading = self.heading + step / self.config.wheelbase * math.tan(math.radians(self.steering))
+            x = self.x + step * math.cos(heading)
+            y = self.y + step * math.sin(heading)
+            if self._blocked(x, y):
+                self.collisions += 1
+                break
+            self.x, self.y, self.heading = x, y, heading
+            self.distance_travelled += abs(step)
+
+    def _blocked(self, x: float, y: float, clearance: float = 8.0) -> bool:
+        if not (clearance <= x <= self.width - clearance and clearance <= y <= self.height - clearance):
+            return True
+        return any(math.hypot(x - o.x, y - o.y) < o.radius + clearance for o in self.obstacles)
+
+    def cast(self, angle: float) -> float:
+        """Distance in cm from the rover along heading + angle (radians) to the first hit"""
+        dx, dy = math.cos(self.heading + angle), math.sin(self.heading + angle)
+        # Walls
+        hits = []
+        if dx > 0:
+            hits.append((self.width - self.x) / dx)
+        elif dx < 0:
+            hits.append(-self.x / dx)
+        if dy > 0:
+            hits.append((self.height - self.y) / dy)
+        elif dy < 0:
+            hits.append(-self.y / dy)
+        nearest = min(hits) if hits else math.inf
+        # Obstacles: ray/circle intersection
+        for o in self.obstacles:
+            ox, oy = o.x - self.x, o.y - self.y
+            along = ox * dx + oy * dy
+            if along <= 0:
+                continue
+            miss = ox * dy - oy * dx
+            if abs(miss) < o.radius:
+                nearest = min(nearest, along - math.sqrt(o.radius ** 2 - miss ** 2))
+        return nearest
+
+    def ultrasonic(self, beam: float = math.radians(15)) -> float:
+        with self._lock:
+            self._advance()
+            return min(self.cast(-beam), self.cast(0.0), self.cast(beam))
+
+    def pose(self) -> tuple:
+        with self._lock:
+            self._advance()
+            return self.x, self.y, self.heading
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._advance()
+            return {
+                "x": round(self.x, 1),
+                "y": round(self.y, 1),
+                "heading": round(math.degrees(self.heading), 1),
+                "speed": self.speed,
+                "steering": self.steering,
+                "collisions": self.collisions,
+                "distance_travelled": round(self.distance_travelled, 1)
+            }
+
+
+_config: Optional[SimConfig] = None
+_world: Optional[SimWorld] = None
+
+
+def get_world() -> SimWorld:
+    """The simulated world shared by SimPicarx and SimVilib"""
+    global _config, _world
+    if _world is None:
+        _config = SimConfig.from_env()
+        _world = SimWorld(_config)
+    return _world
+
+
+class _SimServo:
+    def __init__(self, angle: float = 0):
+        self.angle = angle
+
+
+class _SimUltrasonic:
+    def __init__(self, world: SimWorld):
+        self._world = world
+
+    def read(self) -> float:
+        config = self._world.config
+        if config.sensor_latency:
+            time.sleep(config.sensor_latency)
+        distance = self._world.ultrasonic() + random.gauss(0, config.sensor_noise)
+        return round(max(2.0, min(config.sensor_range, distance)), 2)
+
+
+class SimPicarx:
+    """Picarx stand-in driving the simulated world"""
+
+    def __init__(self):
+        self.world = get_world()
+        self.ultrasonic = _SimUltrasonic(self.world)
+        self.cam_pan = _SimServo()
+        self.cam_tilt = _SimServo()
+        self.dir_servo = _SimServo()
+
+    def set_dir_servo_angle(self, angle):
+        self.dir_servo.angle = angle
+        self.world.command(steering=angle)
+
+    def set_cam_pan_angle(self, angle):
+        self.cam_pan.angle = angle
+        self.world.camera_pan = angle
+
+    def set_cam_tilt_angle(self, angle):
+        self.cam_tilt.angle = angle
+
+    def forward(self, speed):
+        self.world.command(speed=speed)
+
+    def backward(self, speed):
+        self.world.command(speed=-speed)
+
+    def stop(self):
+        self.world.command(speed=0)
+
+
+class SimVilib:
+    """Vilib stand-in: a camera thread updating img, plus an MJPEG server"""
+
+    img = None
+    _camera_thread: Optional[threading.Thread] = None
+    _server: Optional[ThreadingHTTPServer] = None
+    _running = False
+    _jpeg_lock = threading.Lock()
+    _jpeg_cache = (None, None)  # (frame, encoded bytes) shared by stream clients
+    frames_rendered = 0
+
+    @classmethod
+    def camera_start(cls, vflip: bool = False, hflip: bool = False):
+        if cls._running:
+            return
+        cls._running = True
+        world = get_world()
+        source = _VideoSource(world.config) if world.config.video else _WorldRenderer(world)
+        cls._camera_thread = threading.Thread(target=cls._camera_loop, args=(source, world.config.fps), name="sim-camera", daemon=True)
+        cls._camera_thread.start()
+
+    @classmethod
+    def display(cls, local: bool = False, web: bool = True):
+        if web and cls._server is None:
+            port = get_world().config.stream_port
+            cls._server = ThreadingHTTPServer(("0.0.0.0", port), _MJPEGHandler)
+            cls._server.daemon_threads = True
+            threading.Thread(target=cls._server.serve_forever, name="sim-mjpeg", daemon=True).start()
+
+    @classmethod
+    def camera_close(cls):
+        cls._running = False
+        if cls._server is not None:
+            cls._server.shutdown()
+            cls._server.server_close()
+            cls._server = None
+
+    @classmethod
+    def jpeg(cls) -> Optional[bytes]:
+        """JPEG of the current frame, encoded once however many clients ask"""
+        frame = cls.img
+        if frame is None:
+            return None
+        with cls._jpeg_lock:
+            cached_frame, data = cls._jpeg_cache
+            if cached_frame is not frame:
+                ok, encoded = cv2.imencode(".jpg", frame)
+                data = encoded.tobytes() if ok else None
+                cls._jpeg_cache = (frame, data)
+            return data
+
+    @classmethod
+    def _camera_loop(cls, source, fps: float):
+        interval = 1.0 / fps
+        next_frame = time.monotonic()
+        while cls._running:
+            # A new array per frame, as vilib does, so consumers can compare frames by identity
+            cls.img = source.next_frame()
+            cls.frames_rendered += 1
+            next_frame += interval
+            delay = next_frame - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                next_frame = time.monotonic()
+
+
+SIM_CLASSES = ["obstacle"]
+
+
+class SimNet:
+    """Stand-in for a cv2.dnn network that finds the rendered obstacles.
+
+    Obstacles are drawn as solid colored blocks in a gray room, so strongly
+    colored regions of the input blob are reported as detections. Output
+    uses the raw darknet YOLO layout, padded with empty rows to the size of
+    a tiny-YOLO output, so blob creation, decoding and NMS all do their
+    usual work. Boxes are found in the blob itself, which keeps them right
+    for cropped regions too.
+    """
+
+    def __init__(self, input_size, latency: float = 0.0, min_chroma: float = 24 / 255, min_area: float = 0.002):
+        width, height = input_size
+        self.latency = latency
+        self.min_chroma = min_chroma
+        self.min_area = min_area
+        # Three anchors per cell on stride 32 and 16 grids, like yolov3-tiny
+        self._layer_rows = (3 * (width // 32) * (height // 32), 3 * (width // 16) * (height // 16))
+        self._blob = None
+
+    def setInput(self, blob):
+        self._blob = blob
+
+    def forward(self, output_layers=None):
+        image = self._blob[0].transpose(1, 2, 0)
+        height, width = image.shape[:2]
+        mask = ((image.max(axis=2) - image.min(axis=2)) > self.min_chroma).astype(np.uint8)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+
+        rows = np.zeros((sum(self._layer_rows), 5 + len(SIM_CLASSES)), dtype=np.float32)
+        count = 0
+        for x, y, w, h, area in stats[1:]:
+            if area < self.min_area * width * height or count == len(rows):
+                continue
+            rows[count, :6] = ((x + w / 2) / width, (y + h / 2) / height, w / width, h / height, 1.0, 0.9)
+            count += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [rows[:self._layer_rows[0]], rows[self._layer_rows[0]:]]
+
+
+class SimDetector(DetectorBackend):
+    """Detector backend running SimNet instead of a model file"""
+
+    def load(self):
+        self.net = SimNet(self.input_size, get_world().config.inference_latency)
+        self.classes = list(SIM_CLASSES)
+        self.output_layers = ["yolo_16", "yolo_23"]
+
+
+class _WorldRenderer:
+    """Draws the obstacles in front of the rover as a simple first-person view"""
+
+    FOV = math.radians(62)
+
+    def __init__(self, world: SimWorld):
+        self.world = world
+        width, height = world.config.width, world.config.height
+        self.focal = width / 2 / math.tan(self.FOV / 2)
+        # Sky-to-floor gradient, rendered once
+        shade = np.linspace(200, 90, height, dtype=np.float32)[:, None]
+        self.background = np.repeat(shade, width, axis=1).astype(np.uint8)[:, :, None].repeat(3, axis=2)
+
+    def next_frame(self):
+        config = self.world.config
+        frame = self.background.copy()
+        x, y, heading = self.world.pose()
+        view = heading + math.radians(self.world.camera_pan)
+        horizon = config.height // 2
+
+        visible = []
+        for o in self.world.obstacles:
+            dx, dy = o.x - x, o.y - y
+            distance = math.hypot(dx, dy)
+            bearing = math.atan2(dy, dx) - view
+            bearing = math.atan2(math.sin(bearing), math.cos(bearing))
+            if distance <= o.radius or abs(bearing) > self.FOV / 2 + math.atan2(o.radius, distance):
+                continue
+            visible.append((distance, bearing, o))
+
+        # Far to near so closer obstacles are drawn over farther ones
+        for distance, bearing, o in sorted(visible, key=lambda item: -item[0]):
+            center = config.width / 2 + self.focal * math.tan(bearing)
+            half_width = self.focal * o.radius / distance
+            top = horizon - self.focal * (o.height - 10) / distance
+            bottom = horizon + self.focal * 10 / distance
+            cv2.rectangle(
+                frame,
+                (int(center - half_width), int(top)),
+                (int(center + half_width), int(bottom)),
+                o.color,
+                -1
+            )
+
+        cv2.putText(frame, f"SIM {time.strftime('%H:%M:%S')}", (10, 24), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 1)
+        return frame
+
+
+class _VideoSource:
+    """Loops a video file, resized to the configured resolution"""
+
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.capture = cv2.VideoCapture(config.video)
+        if not self.capture.isOpened():
+            raise ValueError(f"Cannot open simulator video: {config.video}")
+
+    def next_frame(self):
+        ok, frame = self.capture.read()
+        if not ok:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.capture.read()
+            if not ok:
+                return np.zeros((self.config.height, self.config.width, 3), dtype=np.uint8)
+        if frame.shape[1] != self.config.width or frame.shape[0] != self.config.height:
+            frame = cv2.resize(frame, (self.config.width, self.config.height), interpolation=cv2.INTER_AREA)
+        return frame
+
+
+class _MJPEGHandler(BaseHTTPRequestHandler):
+    """Serves /mjpg as multipart JPEG, like vilib's web display"""
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/mjpg":
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "multipart/x-mixed-replace; boundary=frame")
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        interval = 1.0 / get_world().config.fps
+        last_frame = None
+        try:
+            while SimVilib._running:
+                frame = SimVilib.img
+                if frame is None or frame is last_frame:
+                    time.sleep(interval / 2)
+                    continue
+                last_frame = frame
+                data = SimVilib.jpeg()
+                if data is None:
+                    continue
+                self.wfile.write(
+                    b"--frame\r\nContent-Type: image/jpeg\r\n"
+                    + f"Content-Length: {len(data)}\r\n\r\n".encode()
+                    + data + b"\r\n"
+                )
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def log_message(self, format, *args):
+        pass
@@ -0,0 +1,183 @@
+import os
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import rover_metrics
+
+SNAPSHOT_STAGE_SECONDS = rover_metrics.histogram(
+    "rover_snapshot_stage_seconds", "Time spent encoding and writing snapshots", ("stage",)
+)
+_ENCODE_STAGE = SNAPSHOT_STAGE_SECONDS.labels(stage="encode")
+_WRITE_STAGE = SNAPSHOT_STAGE_SECONDS.labels(stage="write")
+
+SNAPSHOT_PREFIX = "snapshot_"
+SNAPSHOT_SUFFIX = ".jpg"
+TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+
+def parse_snapshot_time(filename: str) -> Optional[datetime]:
+    """Capture time encoded in a snapshot filename (None if it is not one of ours)"""
+    if not (filename.startswith(SNAPSHOT_PREFIX) and filename.endswith(SNAPSHOT_SUFFIX)):
+        return None
+    stamp = filename[len(SNAPSHOT_PREFIX):-len(SNAPSHOT_SUFFIX)]
+    try:
+        # Names carry milliseconds (and a counter on collision) after the seconds
+        return datetime.strptime(stamp[:15], TIMESTAMP_FORMAT).replace(
+            microsecond=int(stamp[16:19]) * 1000 if len(stamp) >= 19 else 0
+        )
+    except ValueError:
+        return None
+
+
+class SnapshotStore:
+    """Saves snapshots on a background writer thread and keeps an index of them.
+
+    The directory is listed once at start; after that the index is updated
+    as snapshots are written, so listing never touches the filesystem and
+    retention evicts the oldest entry in O(1). Captures return a Future that
+    resolves once the image is on disk.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_snapshots: int = 10,
+        queue_size: int = 32,
+        on_event: Optional[Callable[[str, str], None]] = None
+    ):
+        self.directory = directory
+        self.max_snapshots = max_snapshots
+        self._on_event = on_event
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._index: OrderedDict = OrderedDict()  # filename -> capture datetime, oldest first
+        self._reserved = set()  # names handed out but not yet written
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Index the snapshots already on disk and start the writer"""
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            captured = parse_snapshot_time(name)
+            if captured is not None:
+                entries.append((name, captured))
+        with self._lock:
+            self._index = OrderedDict(sorted(entries, key=lambda entry: (entry[1], entry[0])))
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """Finish queued writes and stop the writer"""
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def capture(self, frame) -> Future:
+        """Queue a Frame to be saved; the future resolves with the snapshot info
+
+        The frame's JPEG bytes are written as is, so a frame already encoded
+        for the video stream is saved without re-encoding.
+        """
+        future: Future = Future()
+        if frame is None:
+            future.set_result({"success": False, "error": "No frame available"})
+            return future
+        if self._thread is None:
+            future.set_result({"success": False, "error": "Snapshot writer is not running"})
+            return future
+
+        # Filenames keep millisecond precision, so the index does too
+        captured = datetime.now()
+        captured = captured.replace(microsecond=captured.microsecond // 1000 * 1000)
+        filename = self._reserve_name(captured)
+        try:
+            self._queue.put_nowait((filename, captured, frame, future))
+        except queue.Full:
+            with self._lock:
+                self._reserved.discard(filename)
+            future.set_result({"success": False, "error": "Snapshot queue is full"})
+        return future
+
+    def list(self) -> List[dict]:
+        """Saved snapshots, oldest first"""
+        with self._lock:
+            return [
+                {"filename": name, "timestamp": captured.isoformat()}
+                for name, captured in self._index.items()
+            ]
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _reserve_name(self, captured: datetime) -> str:
+        base = f"{SNAPSHOT_PREFIX}{captured.strftime(TIMESTAMP_FORMAT)}_{captured.microsecond // 1000:03d}"
+        with self._lock:
+            filename = f"{base}{SNAPSHOT_SUFFIX}"
+            counter = 1
+            while filename in self._index or filename in self._reserved:
+                filename = f"{base}_{counter}{SNAPSHOT_SUFFIX}"
+                counter += 1
+            self._reserved.add(filename)
+        return filename
+
+    def _emit(self, event_type: str, message: str):
+        if self._on_event is not None:
+            self._on_event(event_type, message)
+
+    def _write(self, filename: str, captured: datetime, frame) -> dict:
+        filepath = os.path.join(self.directory, filename)
+        with _ENCODE_STAGE.time():
+            jpeg = frame.jpeg  # encodes here, off the caller's thread, if nothing has yet
+        if jpeg is None:
+            raise ValueError("JPEG encoding failed")
+        # Write under a temporary name so a half-written file is never served
+        temp_path = filepath + ".tmp"
+        with _WRITE_STAGE.time():
+            with open(temp_path, "wb") as f:
+                f.write(jpeg)
+            os.replace(temp_path, filepath)
+
+        with self._lock:
+            self._reserved.discard(filename)
+            self._index[filename] = captured
+            evicted = []
+            while len(self._index) > self.max_snapshots:
+                evicted.append(self._index.popitem(last=False)[0])
+
+        for old_file in evicted:
+            self._emit("STATUS", f"Removing old snapshot: {old_file}")
+            try:
+                os.remove(os.path.join(self.directory, old_file))
+            except FileNotFoundError:
+                pass
+
+        return {
+            "success": True,
+            "filename": filename,
+            "timestamp": captured.strftime(TIMESTAMP_FORMAT)
+        }
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            filename, captured, frame, future = item
+            try:
+                result = self._write(filename, captured, frame)
+                self._emit("STATUS", f"Snapshot taken: {filename}")
+            except Exception as e:
+                with self._lock:
+                    self._reserved.discard(filename)
+                error_msg = f"Failed to take snapshot: {str(e)}"
+                self._emit("ERROR", error_msg)
+                print(f"Snapshot error: {error_msg}")  # Console logging
+                result = {"success": False, "error": str(e)}
+            future.set_result(result)
@@ -0,0 +1,367 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # optional: without it assets are served gzip-compressed only
+    brotli = None
+
+# Assets served under a ?v=<content hash> URL never change, so browsers may keep them
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Unversioned asset URLs are revalidated on every use, which costs a 304 rather than the file
+REVALIDATE_CACHE_CONTROL = "no-cache"
+# Files that come and go while running (snapshots) get a short lifetime, then revalidation
+VOLATILE_CACHE_CONTROL = "public, max-age=10, must-revalidate"
+
+# Formats that compress well; images and woff2 fonts are compressed already
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".map", ".json", ".svg", ".html", ".txt", ".ttf", ".otf", ".eot"}
+# A compressed variant is only kept if it saves at least this fraction
+MIN_SAVING = 0.1
+# Seconds between checks of an indexed file for changes on disk
+RECHECK_INTERVAL = 1.0
+
+ENCODING_SUFFIXES = {"br": "br", "gzip": "gz"}
+
+mimetypes.add_type("font/woff2", ".woff2")
+mimetypes.add_type("font/ttf", ".ttf")
+
+
+def _compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Content codings a client accepts, from its Accept-Encoding header"""
+    accepted = set()
+    wildcard = False
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        if coding == "*":
+            wildcard = True
+        elif coding:
+            accepted.add(coding)
+    if wildcard:
+        accepted.update(ENCODING_SUFFIXES)
+    return accepted
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match comparison, which uses weak matching (RFC 9110 13.1.2)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def cached_response(
+    request_headers: Headers,
+    body: bytes,
+    media_type: str,
+    etag: str,
+    cache_control: str,
+    extra_headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """A response with validators, or 304 Not Modified when the client's copy matches"""
+    headers = {"ETag": etag, "Cache-Control": cache_control, **(extra_headers or {})}
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type=media_type, headers=headers)
+
+
+class VolatileStaticFiles(StaticFiles):
+    """Files that come and go while running (snapshots), served from disk.
+
+    Starlette's file responses carry ETag/Last-Modified and answer 304s;
+    this adds a short cache lifetime so clients revalidate soon.
+    """
+
+    async def __call__(self, scope, receive, send):
+        async def send_with_cache_control(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    (name, value) for name, value in message.get("headers", []) if name.lower() != b"cache-control"
+                ] + [(b"cache-control", VOLATILE_CACHE_CONTROL.encode())]
+            await send(message)
+
+        await super().__call__(scope, receive, send_with_cache_control)
+
+
+class _Asset:
+    __slots__ = ("stat_key", "digest", "media_type", "compressible", "bodies", "checked")
+
+    def __init__(self, stat_key: Tuple[int, int], digest: str, media_type: str, compressible: bool, bodies: Dict[str, bytes]):
+        self.stat_key = stat_key
+        self.digest = digest
+        self.media_type = media_type
+        self.compressible = compressible
+        # content coding ("identity", "gzip", "br") -> bytes; replaced, never mutated,
+        # when the compressed variants are ready
+        self.bodies = bodies
+        self.checked = time.monotonic()  # when the file was last compared with stat_key
+
+    @property
+    def version(self) -> str:
+        return self.digest[:12]
+
+
+class PrecompressedStaticFiles:
+    """Serves a static directory from memory with precompressed variants.
+
+    Every asset is read and hashed at construction. Compressed variants
+    (gzip, plus brotli when the brotli package is installed) are built on
+    a background thread once warm_up() is called, and cached on disk under
+    cache_dir by content hash, so brotli's slow maximum quality is only
+    paid the first time a file is seen. Until its variants are ready an
+    asset is served uncompressed. Requests get the best encoding the
+    client accepts, a strong ETag per content hash and encoding, and 304
+    responses to matching If-None-Match.
+
+    URLs carrying the asset's content hash as ?v= (see url()) are served
+    as immutable; plain URLs are revalidated. Requests for indexed assets
+    never touch the disk: at most every RECHECK_INTERVAL seconds a request
+    queues a check of the file on the background thread, which reloads and
+    recompresses it if it changed, so edits show up on a later request.
+    Paths missing from the index are looked up in the threadpool.
+    Subdirectories listed in volatile (snapshots) are served straight from
+    disk with a short cache lifetime instead of being indexed.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        prefix: str = "/static",
+        volatile: Iterable[str] = ("snapshots",),
+        cache_dir: Optional[str] = "data/static"
+    ):
+        self.directory = os.path.abspath(directory)
+        self.prefix = prefix.rstrip("/")
+        self.volatile = set(volatile)
+        self.cache_dir = cache_dir
+        self.encodings = ["br", "gzip"] if brotli is not None else ["gzip"]
+        self._files = VolatileStaticFiles(directory=directory)
+        self._assets: Dict[str, _Asset] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        # One worker, so compression never competes with the request executor for more than a core
+        self._compressor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="static-compress")
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.load()
+
+    def load(self):
+        """Index every non-volatile file under the directory"""
+        for root, dirs, files in os.walk(self.directory):
+            if root == self.directory:
+                dirs[:] = [name for name in dirs if name not in self.volatile]
+            for name in files:
+                path = os.path.relpath(os.path.join(root, name), self.directory).replace(os.sep, "/")
+                self._get(path, compress=False)
+
+    def warm_up(self):
+        """Queue compression of every indexed asset; returns immediately"""
+        with self._lock:
+            assets = list(self._assets.items())
+        for path, asset in assets:
+            if asset.compressible:
+                self._submit(self._compress_asset, path, asset)
+        if self.cache_dir:
+            # Runs after the compression jobs, as the executor has a single worker
+            self._submit(self._prune_cache)
+
+    def close(self):
+        """Drop queued compression jobs and stop the worker"""
+        # Jobs already queued see _closed and return at once
+        self._closed = True
+        self._compressor.shutdown(wait=False)
+
+    def url(self, path: str) -> str:
+        """Versioned URL for an asset, cacheable forever (for templates)"""
+        path = path.lstrip("/")
+        asset = self._assets.get(path)
+        if asset is None:
+            return f"{self.prefix}/{path}"
+        return f"{self.prefix}/{path}?v={asset.version}"
+
+    def _submit(self, fn, *args):
+        if self._closed:
+            return
+        try:
+            self._compressor.submit(fn, *args)
+        except RuntimeError:  # shut down between the check and the submit
+            pass
+
+    def _load_asset(self, path: str, full_path: str, stat_key: Tuple[int, int]) -> _Asset:
+        with open(full_path, "rb") as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+        compressible = os.path.splitext(path)[1].lower() in COMPRESSIBLE_SUFFIXES
+        return _Asset(stat_key, digest, media_type, compressible, {"identity": data})
+
+    def _compress_asset(self, path: str, asset: _Asset):
+        if self._closed:
+            return
+        try:
+            data = asset.bodies["identity"]
+            variants = {}
+            for encoding in self.encodings:
+                compressed = self._compressed(data, asset.digest, encoding)
+                if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                    variants[encoding] = compressed
+        except Exception as e:
+            print(f"Error compressing static/{path}: {e}")
+            return
+        with self._lock:
+            # The file may have changed again meanwhile; its newer asset has its own job
+            if self._assets.get(path) is asset:
+                asset.bodies = {**asset.bodies, **variants}
+
+    def _prune_cache(self):
+        """Drop compressed copies of files that have since changed"""
+        if self._closed:
+            return
+        with self._lock:
+            digests = {asset.digest for asset in self._assets.values()}
+        try:
+            for name in os.listdir(self.cache_dir):
+                if name.partition(".")[0] not in digests:
+                    os.remove(os.path.join(self.cache_dir, name))
+        except OSError as e:
+            print(f"Error pruning static cache: {e}")
+
+    def _compressed(self, data: bytes, digest: str, encoding: str) -> bytes:
+        if not self.cache_dir:
+            return _compress(data, encoding)
+        cache_path = os.path.join(self.cache_dir, f"{digest}.{ENCODING_SUFFIXES[encoding]}")
+        try:
+            with open(cache_path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            pass
+        compressed = _compress(data, encoding)
+        # Write under a temporary name so a half-written file is never reused
+        temp_path = cache_path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(temp_path, cache_path)
+        return compressed
+
+    def _get(self, path: str, compress: bool = True) -> Optional[_Asset]:
+        """The asset at path, reloaded if the file changed; None if it does not exist"""
+        full_path = os.path.realpath(os.path.join(self.directory, path))
+        if os.path.commonpath([full_path, self.directory]) != self.directory:
+            return None
+        try:
+            stat = os.stat(full_path)
+        except (FileNotFoundError, NotADirectoryError):
+            with self._lock:
+                self._assets.pop(path, None)
+            return None
+        if not os.path.isfile(full_path):
+            return None
+        stat_key = (stat.st_mtime_ns, stat.st_size)
+        asset = self._assets.get(path)
+        if asset is None or asset.stat_key != stat_key:
+            asset = self._load_asset(path, full_path, stat_key)
+            with self._lock:
+                self._assets[path] = asset
+            if compress and asset.compressible:
+                self._submit(self._compress_asset, path, asset)
+        return asset
+
+    def _recheck(self, path: str):
+        """Reload an indexed asset if its file changed (runs on the compressor thread)"""
+        if self._closed:
+            return
+        try:
+            self._get(path)
+        except OSError as e:
+            print(f"Error reloading static/{path}: {e}")
+
+    def _negotiate(self, bodies: Dict[str, bytes], headers: Headers) -> str:
+        accepted = accepted_encodings(headers.get("accept-encoding", ""))
+        for encoding in self.encodings:
+            if encoding in bodies and encoding in accepted:
+                return encoding
+        return "identity"
+
+    async def __call__(self, scope, receive, send):
+        assert scope["type"] == "http"
+        path = self._files.get_path(scope).replace(os.sep, "/")
+        if path.split("/", 1)[0] in self.volatile:
+            await self._files(scope, receive, send)
+            return
+
+        if scope["method"] not in ("GET", "HEAD"):
+            response = Response("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+        else:
+            asset = self._assets.get(path)
+            if asset is None:
+                # New file, or one that does not exist: the disk check runs off the event loop
+                asset = await run_in_threadpool(self._get, path)
+            else:
+                now = time.monotonic()
+                if now - asset.checked >= RECHECK_INTERVAL:
+                    asset.checked = now
+                    self._submit(self._recheck, path)
+            if asset is None:
+                response = Response("Not Found", status_code=404, media_type="text/plain")
+            else:
+                response = self._asset_response(scope, asset)
+        await response(scope, receive, send)
+
+    def _asset_response(self, scope, asset: _Asset) -> Response:
+        headers = Headers(scope=scope)
+        bodies = asset.bodies
+        encoding = self._negotiate(bodies, headers)
+        etag = f'"{asset.digest[:32]}"' if encoding == "identity" else f'"{asset.digest[:32]}-{ENCODING_SUFFIXES[encoding]}"'
+        query = scope.get("query_string", b"").decode("latin-1")
+        versioned = f"v={asset.version}" in query.split("&")
+        extra_headers = {}
+        if asset.compressible:
+            # Also while the variants are still being built, so caches don't keep the identity body for everyone
+            extra_headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            extra_headers["Content-Encoding"] = encoding
+        return cached_response(
+            headers,
+            bodies[encoding],
+            asset.media_type,
+            etag,
+            IMMUTABLE_CACHE_CONTROL if versioned else REVALIDATE_CACHE_CONTROL,
+            extra_headers
+        )
@@ -0,0 +1,363 @@
+import asyncio
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Callable, Optional, Set
+
+import aiohttp
+import cv2
+import numpy as np
+
+JPEG_START = b"\xff\xd8"
+JPEG_END = b"\xff\xd9"
+MJPEG_BOUNDARY = "frame"
+
+
+def mjpeg_part(jpeg: bytes) -> bytes:
+    """Wrap one JPEG frame as a multipart/x-mixed-replace part"""
+    header = (
+        f"--{MJPEG_BOUNDARY}\r\n"
+        f"Content-Type: image/jpeg\r\n"
+        f"Content-Length: {len(jpeg)}\r\n\r\n"
+    ).encode()
+    return header + jpeg + b"\r\n"
+
+
+class MJPEGParser:
+    """Incrementally splits an MJPEG byte stream into JPEG frames.
+
+    Frames are found by their start/end of image markers, so the parser
+    does not depend on the upstream multipart boundary or headers.
+    """
+
+    def __init__(self, max_buffer: int = 4 * 1024 * 1024):
+        self._buffer = bytearray()
+        self._max_buffer = max_buffer
+
+    def feed(self, chunk: bytes) -> list:
+        """Add a chunk and return any complete frames it finished"""
+        self._buffer += chunk
+        frames = []
+        while True:
+            start = self._buffer.find(JPEG_START)
+            if start < 0:
+                # Keep a trailing 0xff in case the marker is split across chunks
+                del self._buffer[:-1]
+                break
+            end = self._buffer.find(JPEG_END, start + 2)
+            if end < 0:
+                del self._buffer[:start]
+                break
+            frames.append(bytes(self._buffer[start:end + 2]))
+            del self._buffer[:end + 2]
+
+        if len(self._buffer) > self._max_buffer:
+            self._buffer.clear()
+        return frames
+
+
+class Subscription:
+    """A subscriber's bounded frame queue plus delivery counters"""
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.delivered = 0
+        self.dropped = 0
+
+    def offer(self, frame: bytes) -> bool:
+        """Queue a frame, dropping the stale one if the subscriber is behind"""
+        dropped = False
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            dropped = True
+        self.queue.put_nowait(frame)
+        return dropped
+
+    async def get(self) -> bytes:
+        frame = await self.queue.get()
+        self.delivered += 1
+        return frame
+
+
+class FrameChannel(ABC):
+    """Fans frames out to subscribers through per-subscriber bounded queues.
+
+    The producer task is started when the first subscriber arrives and
+    cancelled when the last one leaves. When a slow client falls behind, its
+    oldest queued frame is dropped so it always receives the newest picture.
+    """
+
+    def __init__(self, queue_size: int = 2):
+        self.queue_size = queue_size
+        self._subscribers: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        self.latest_frame: Optional[bytes] = None
+        self.frame_seq = 0
+        self.frame_time = 0.0
+        self.dropped_frames = 0
+
+    def subscribe(self, queue_size: Optional[int] = None) -> Subscription:
+        """Register a subscriber and make sure the producer is running"""
+        subscription = Subscription(queue_size or self.queue_size)
+        self._subscribers.add(subscription)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+        if not self._subscribers and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def frames(self):
+        """Async iterator over frames for one subscriber"""
+        subscription = self.subscribe()
+        try:
+            while True:
+                yield await subscription.get()
+        finally:
+            self.unsubscribe(subscription)
+
+    async def close(self):
+        self._subscribers.clear()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    @property
+    def active(self) -> bool:
+        return bool(self._subscribers)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "frames": self.frame_seq,
+            "dropped_frames": self.dropped_frames,
+            "running": self._task is not None and not self._task.done()
+        }
+
+    def _publish(self, frame: bytes):
+        self.latest_frame = frame
+        self.frame_seq += 1
+        self.frame_time = time.time()
+        for subscription in self._subscribers:
+            if subscription.offer(frame):
+                self.dropped_frames += 1
+
+    @abstractmethod
+    async def _run(self):
+        """Produce frames and _publish() them until cancelled"""
+
+
+class MJPEGBroadcaster(FrameChannel):
+    """Shares one upstream MJPEG connection among all subscribers
+
+    on_frame, if given, is called with every upstream JPEG so other
+    consumers can reuse the encoded bytes.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        session_getter: Callable[[], aiohttp.ClientSession],
+        queue_size: int = 2,
+        reconnect_delay: float = 1.0,
+        on_frame: Optional[Callable[[bytes], None]] = None
+    ):
+        super().__init__(queue_size)
+        self.url = url
+        self._get_session = session_getter
+        self._on_frame = on_frame
+        self.reconnect_delay = reconnect_delay
+        self.reconnects = 0
+
+    def stats(self) -> dict:
+        return {**super().stats(), "reconnects": self.reconnects}
+
+    async def _run(self):
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=10)
+        while self._subscribers:
+            parser = MJPEGParser()
+            try:
+                async with self._get_session().get(self.url, timeout=timeout) as response:
+                    async for chunk in response.content.iter_chunked(16384):
+                        for frame in parser.feed(chunk):
+                            self._publish(frame)
+                            if self._on_frame is not None:
+                                self._on_frame(frame)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Video upstream error: {str(e)}")  # Console logging
+            if self._subscribers:
+                self.reconnects += 1
+                await asyncio.sleep(self.reconnect_delay)
+
+
+@dataclass(frozen=True)
+class StreamProfile:
+    max_fps: Optional[float] = None  # None keeps the source rate
+    scale: float = 1.0
+    quality: Optional[int] = None  # JPEG quality; None keeps the source encoding
+
+    @property
+    def reencode(self) -> bool:
+        return self.scale < 1.0 or self.quality is not None
+
+    def to_dict(self) -> dict:
+        return {"max_fps": self.max_fps, "scale": self.scale, "quality": self.quality}
+
+
+# Profiles tried by automatic mode, from best to cheapest
+AUTO_PROFILES = (
+    StreamProfile(),
+    StreamProfile(max_fps=15, scale=0.75, quality=70),
+    StreamProfile(max_fps=10, scale=0.5, quality=60),
+    StreamProfile(max_fps=5, scale=0.5, quality=40),
+)
+
+
+def reencode_jpeg(jpeg: bytes, scale: float, quality: Optional[int]) -> bytes:
+    """Decode, downscale and re-encode a JPEG frame"""
+    image = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        return jpeg
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    params = [cv2.IMWRITE_JPEG_QUALITY, quality] if quality is not None else []
+    ok, encoded = cv2.imencode(".jpg", image, params)
+    return encoded.tobytes() if ok else jpeg
+
+
+class ProfileChannel(FrameChannel):
+    """Derives a rate-limited and/or re-encoded stream from a source channel.
+
+    The re-encode happens once per frame for the profile and is shared by
+    every subscriber of the profile.
+    """
+
+    def __init__(self, source: FrameChannel, profile: StreamProfile, queue_size: int = 2):
+        super().__init__(queue_size)
+        self.source = source
+        self.profile = profile
+
+    def stats(self) -> dict:
+        return {**super().stats(), "profile": self.profile.to_dict()}
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        min_interval = 1.0 / self.profile.max_fps if self.profile.max_fps else 0.0
+        last_sent = 0.0
+        # A single-slot source subscription drops frames that arrive while encoding
+        subscription = self.source.subscribe(queue_size=1)
+        try:
+            while True:
+                frame = await subscription.get()
+                now = time.monotonic()
+                if now - last_sent < min_interval:
+                    continue
+                last_sent = now
+                if self.profile.reencode:
+                    frame = await loop.run_in_executor(
+                        None, reencode_jpeg, frame, self.profile.scale, self.profile.quality
+                    )
+                self._publish(frame)
+        finally:
+            self.source.unsubscribe(subscription)
+
+
+class VideoStreamHub:
+    """Serves the upstream stream in any number of per-client profiles.
+
+    Each distinct profile has one shared channel, so encoding cost scales
+    with the number of profiles in use rather than the number of viewers.
+    """
+
+    def __init__(
+        self,
+        source: FrameChannel,
+        auto_window: float = 2.0,
+        downshift_drop_ratio: float = 0.2,
+        upshift_windows: int = 5
+    ):
+        self.source = source
+        self._channels = {}  # StreamProfile -> ProfileChannel
+        self.auto_window = auto_window
+        self.downshift_drop_ratio = downshift_drop_ratio
+        self.upshift_windows = upshift_windows
+
+    def channel(self, profile: StreamProfile) -> FrameChannel:
+        if profile == StreamProfile():
+            return self.source
+        # Forget channels nobody is watching any more
+        for stale in [p for p, c in self._channels.items() if not c.active]:
+            del self._channels[stale]
+        if profile not in self._channels:
+            self._channels[profile] = ProfileChannel(self.source, profile)
+        return self._channels[profile]
+
+    async def frames(self, profile: StreamProfile):
+        """Async iterator over frames of a fixed profile"""
+        async for frame in self.channel(profile).frames():
+            yield frame
+
+    async def adaptive_frames(self):
+        """Async iterator that moves the client between AUTO_PROFILES.
+
+        The client's drop ratio over each window measures how fast it drains
+        frames: heavy drops shift down a profile, and several clean windows
+        in a row shift back up.
+        """
+        level = 0
+        clean_windows = 0
+        channel = self.channel(AUTO_PROFILES[level])
+        subscription = channel.subscribe()
+        window_start = time.monotonic()
+        try:
+            while True:
+                yield await subscription.get()
+
+                if time.monotonic() - window_start < self.auto_window:
+                    continue
+                offered = subscription.delivered + subscription.dropped
+                drop_ratio = subscription.dropped / offered if offered else 0.0
+                new_level = level
+                if drop_ratio > self.downshift_drop_ratio and level < len(AUTO_PROFILES) - 1:
+                    new_level = level + 1
+                    clean_windows = 0
+                elif subscription.dropped == 0:
+                    clean_windows += 1
+                    if clean_windows >= self.upshift_windows and level > 0:
+                        new_level = level - 1
+                        clean_windows = 0
+                else:
+                    clean_windows = 0
+
+                if new_level != level:
+                    channel.unsubscribe(subscription)
+                    level = new_level
+                    channel = self.channel(AUTO_PROFILES[level])
+                    subscription = channel.subscribe()
+                else:
+                    subscription.delivered = subscription.dropped = 0
+                window_start = time.monotonic()
+        finally:
+            channel.unsubscribe(subscription)
+
+    async def close(self):
+        for channel in self._channels.values():
+            await channel.close()
+        self._channels.clear()
+        await self.source.close()
+
+    def stats(self) -> dict:
+        return {
+            "source": self.source.stats(),
+            "profiles": [channel.stats() for channel in self._channels.values() if channel.active]
+        }
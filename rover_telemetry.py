@@ -0,0 +1,63 @@
+import asyncio
+from typing import Optional, Set
+
+
+class TelemetryBroadcaster:
+    """Delivers controller telemetry messages to WebSocket clients.
+
+    The controller calls the listener from its sampler thread; messages are
+    handed to the event loop and copied into each client's bounded queue.
+    A client that falls too far behind has its backlog replaced by a full
+    status snapshot so it never applies deltas out of order.
+    """
+
+    def __init__(self, controller, queue_size: int = 32):
+        self.controller = controller
+        self.queue_size = queue_size
+        self._clients: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Start receiving telemetry from the controller"""
+        self._loop = loop
+        self.controller.add_telemetry_listener(self._on_telemetry)
+
+    def detach(self):
+        self.controller.remove_telemetry_listener(self._on_telemetry)
+        self._loop = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._clients.discard(queue)
+
+    async def snapshot(self) -> dict:
+        """Full status message for a newly connected client"""
+        status = self.controller.latest_telemetry
+        if status is None:
+            # The sampler has not ticked yet; read once off the event loop
+            loop = asyncio.get_running_loop()
+            status = await loop.run_in_executor(None, self.controller.get_status)
+        return {"type": "snapshot", "status": status, "events": []}
+
+    def _on_telemetry(self, message: dict):
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _dispatch(self, message: dict):
+        for queue in self._clients:
+            if queue.full():
+                events = []
+                while not queue.empty():
+                    events.extend(queue.get_nowait().get("events", []))
+                queue.put_nowait({
+                    "type": "snapshot",
+                    "status": self.controller.latest_telemetry,
+                    "events": events + message["events"]
+                })
+            else:
+                queue.put_nowait(message)
@@ -0,0 +1,177 @@
+import importlib
+import json
+import math
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from rover_commands import CommandChannel
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class FakeController:
+    def __init__(self):
+        self.mode = "manual"
+        self.drives = []
+        self.moves = []
+        self.events = []
+        self.applied = threading.Event()
+
+    def handle_drive_command(self, speed, steer):
+        self.drives.append((speed, steer))
+        self.applied.set()
+        return self.mode == "manual"
+
+    def handle_movement_command(self, command):
+        self.moves.append(command)
+        self.applied.set()
+        return self.mode == "manual"
+
+    def handle_camera_command(self, pan, tilt, log_event=True):
+        self.applied.set()
+
+    def add_event(self, event_type, message):
+        self.events.append((event_type, message))
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def channel():
+    controller = FakeController()
+    channel = CommandChannel(controller, deadman_timeout=0.1, latch_timeout=0.3)
+    channel.start()
+    yield channel
+    channel.stop()
+
+
+@pytest.mark.parametrize("speed, steer", [(math.nan, 0), (10, math.nan), (math.inf, 0), (10, -math.inf)])
+def test_drive_rejects_non_finite_values(channel, speed, steer):
+    with pytest.raises(ValueError):
+        channel.drive(speed, steer)
+    assert channel.received == 0
+    assert channel.controller.drives == []
+
+
+@pytest.mark.parametrize("pan, tilt", [(math.inf, None), (None, math.nan)])
+def test_camera_rejects_non_finite_values(channel, pan, tilt):
+    with pytest.raises(ValueError):
+        channel.camera(pan, tilt)
+    assert channel.received == 0
+
+
+def test_record_rtt_ignores_non_finite_values(channel):
+    channel.record_rtt(20.0)
+    channel.record_rtt(math.nan)
+    channel.record_rtt(math.inf)
+    assert channel.stats()["rtt_ms"] == 20.0
+
+
+def test_drive_is_applied(channel):
+    channel.drive(20, -5)
+    assert channel.controller.applied.wait(1)
+    assert channel.controller.drives[0] == (20, -5)
+
+
+def test_deadman_stops_a_stalled_drive(channel):
+    channel.drive(20, 0)
+    assert wait_until(lambda: channel.deadman_stops == 1)
+    assert channel.controller.drives[-1] == (0, 0)
+    assert channel.controller.events[-1][0] == "WARNING"
+
+
+def test_deadman_stop_refused_outside_manual_mode_logs_nothing(channel):
+    channel.drive(20, 0)
+    assert channel.controller.applied.wait(1)
+    channel.controller.mode = "autonomous"
+    assert wait_until(lambda: channel.deadman_stops == 1)
+    assert channel.controller.events == []
+
+
+def test_latched_move_runs_while_the_client_is_alive(channel):
+    channel.move("forward")
+    for _ in range(6):
+        time.sleep(0.1)
+        channel.heartbeat()
+    assert channel.deadman_stops == 0
+    assert channel.controller.drives == []
+    # Once the heartbeats stop, the latched movement is stopped too
+    assert wait_until(lambda: channel.deadman_stops == 1)
+    assert channel.controller.drives == [(0, 0)]
+
+
+def test_release_stops_a_latched_move(channel):
+    channel.move("left")
+    assert channel.controller.applied.wait(1)
+    channel.release()
+    assert wait_until(lambda: channel.controller.drives == [(0, 0)])
+
+
+def test_stop_move_is_not_stopped_again(channel):
+    channel.move("stop")
+    assert channel.controller.applied.wait(1)
+    channel.release()
+    time.sleep(0.4)
+    assert channel.controller.drives == []
+    assert channel.deadman_stops == 0
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    # The server resolves templates, static assets and its data dirs against the working directory
+    shutil.copytree(os.path.join(ROOT, "templates"), tmp_path / "templates")
+    shutil.copytree(os.path.join(ROOT, "static"), tmp_path / "static", ignore=shutil.ignore_patterns("snapshots"))
+    (tmp_path / "static" / "snapshots").mkdir()
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("ROVER_BACKEND", "sim")
+    monkeypatch.setenv("ROVER_EVENT_LOG_DIR", str(tmp_path / "data" / "events"))
+    monkeypatch.setenv("ROVER_SNAPSHOTS_DIR", str(tmp_path / "static" / "snapshots"))
+    return importlib.import_module("rover_server")
+
+
+def receive_ack(websocket):
+    while True:
+        message = websocket.receive_json()
+        if message["type"] == "ack":
+            return message
+
+
+def test_control_socket_survives_malformed_frames(server):
+    from starlette.testclient import TestClient
+
+    frames = [
+        '{"type": "pong"}',
+        '{"type": "pong", "t": "soon"}',
+        '{"type": "pong", "t": NaN}',
+        '{"type": "pong", "t": 1e999}',
+        '{"type": "pong", "t": 1e12}',
+        "[1, 2]",
+        "5",
+        "not json",
+        b"\xff\xfe",
+        '{"type": "drive", "seq": 1, "speed": NaN}',
+        '{"type": "drive", "seq": 2, "speed": 10, "steer": Infinity}',
+        '{"type": "camera", "seq": 3, "pan": 1e999}'
+    ]
+    with TestClient(server.app) as client:
+        with client.websocket_connect("/ws/control") as websocket:
+            for frame in frames:
+                if isinstance(frame, bytes):
+                    websocket.send_bytes(frame)
+                else:
+                    websocket.send_text(frame)
+                assert receive_ack(websocket)["ok"] is False
+            websocket.send_bytes(json.dumps({"type": "drive", "seq": 4, "speed": 0}).encode())
+            assert receive_ack(websocket) == {"type": "ack", "seq": 4, "ok": True}
+        stats = client.get("/api/commands/stats")
+        assert stats.status_code == 200
+        assert stats.json()["rtt_ms"] is None or math.isfinite(stats.json()["rtt_ms"])
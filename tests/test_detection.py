@@ -0,0 +1,51 @@
+import threading
+
+import numpy as np
+
+from rover_detection import DetectionWorker, decode_yolo_outputs
+
+
+def test_decode_yolo_outputs_thresholds_and_suppresses():
+    rows = np.array([
+        # center_x, center_y, w, h, objectness, class scores
+        [0.5, 0.5, 0.2, 0.4, 1.0, 0.1, 0.9],
+        [0.51, 0.5, 0.2, 0.4, 1.0, 0.1, 0.8],  # overlaps the first, suppressed
+        [0.1, 0.2, 0.1, 0.1, 1.0, 0.7, 0.2],
+        [0.8, 0.8, 0.1, 0.1, 1.0, 0.3, 0.4]  # below the confidence threshold
+    ], dtype=np.float32)
+    boxes, confidences, class_ids = decode_yolo_outputs([rows[:2], rows[2:]], 100, 200)
+    assert boxes.tolist() == [[40, 60, 20, 80], [5, 30, 10, 20]]
+    assert np.allclose(confidences, [0.9, 0.7])
+    assert class_ids.tolist() == [1, 0]
+
+
+def test_decode_yolo_outputs_empty():
+    boxes, confidences, class_ids = decode_yolo_outputs([np.zeros((3, 7), dtype=np.float32)], 100, 100)
+    assert boxes.shape == (0, 4) and len(confidences) == 0 and len(class_ids) == 0
+
+
+def test_worker_coalesces_only_matching_options():
+    release = threading.Event()
+    calls = []
+
+    def analyze(frame, **options):
+        release.wait(1)
+        calls.append(options)
+        return {"success": True, **options}
+
+    worker = DetectionWorker(analyze)
+    worker.start()
+    try:
+        frame = np.zeros((4, 4, 3), dtype=np.uint8)
+        quiet = worker.submit(frame, frame_seq=1, log_events=False)
+        full = worker.submit(frame, frame_seq=1, full=True)
+        assert worker.submit(frame, frame_seq=1, full=True) is full
+        other = worker.submit(frame, frame_seq=2, full=True)
+        assert other is not full
+        release.set()
+        assert quiet.future.result(1)["log_events"] is False
+        assert full.future.result(1)["full"] is True
+        assert other.future.result(1)["frame_seq"] == 2
+    finally:
+        worker.stop()
+    assert len(calls) == 3
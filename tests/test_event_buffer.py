@@ -0,0 +1,58 @@
+from rover_data import EventBuffer, RoverEvent
+
+
+def fill(buffer, count, every_warning=3):
+    for i in range(count):
+        event_type = "WARNING" if i % every_warning == 0 else "STATUS"
+        buffer.add_event(RoverEvent(rover_id=1, event_type=event_type, message=str(i), timestamp=float(i)))
+
+
+def seqs(page):
+    return [event["seq"] for event in page["events"]]
+
+
+def test_before_cursor_walks_back_to_oldest_buffered():
+    buffer = EventBuffer(capacity=10)
+    fill(buffer, 25)
+    assert buffer.first_seq == 16 and buffer.latest_seq == 25
+
+    collected, before = [], None
+    while True:
+        page = buffer.get_page(limit=4, before=before)
+        collected += seqs(page)
+        before = page["next_before"]
+        if not page["has_more"]:
+            break
+    assert collected == list(range(25, 15, -1))
+
+
+def test_since_returns_only_newer_events():
+    buffer = EventBuffer(capacity=50)
+    fill(buffer, 10)
+    page = buffer.get_page(limit=50, since=7)
+    assert seqs(page) == [10, 9, 8]
+    assert not page["has_more"]
+    assert buffer.get_page(since=10)["events"] == []
+
+
+def test_offset_and_type_filter():
+    buffer = EventBuffer(capacity=10)
+    fill(buffer, 25)
+    assert seqs(buffer.get_page(start=2, limit=3)) == [23, 22, 21]
+
+    # WARNING events are seqs 1, 4, 7, ...; only those still buffered (16..25) are returned
+    page = buffer.get_page(limit=2, event_type="WARNING")
+    assert seqs(page) == [25, 22]
+    assert page["has_more"] and page["total"] == 4
+    page = buffer.get_page(limit=2, event_type="WARNING", before=page["next_before"])
+    assert seqs(page) == [19, 16]
+    assert not page["has_more"]
+
+
+def test_first_seq_continues_a_persisted_log():
+    buffer = EventBuffer(capacity=5, first_seq=100)
+    assert buffer.latest_seq == 99
+    assert buffer.get_page()["events"] == []
+    fill(buffer, 2)
+    assert seqs(buffer.get_page()) == [101, 100]
+    assert buffer.get_total_events() == 2
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+from rover_data import RoverEvent
+from rover_eventlog import EventLog, RECORD_HEADER, encode_event
+
+
+def make_event(seq, timestamp, event_type="STATUS"):
+    return RoverEvent(rover_id=1, event_type=event_type, message=f"event {seq}", timestamp=timestamp, seq=seq)
+
+
+def write_log(directory, events, **kwargs):
+    log = EventLog(directory, **kwargs)
+    log.open()
+    for event in events:
+        log.append(event)
+    log.close()
+    return log
+
+
+def read_all(log, **kwargs):
+    seqs, cursor = [], None
+    while True:
+        page = log.query(cursor=cursor, **kwargs)
+        seqs += [event["seq"] for event in page["events"]]
+        cursor = page["next_cursor"]
+        if not page["has_more"]:
+            return seqs
+
+
+def test_reopen_recovers_events_and_next_seq(tmp_path):
+    write_log(str(tmp_path), [make_event(seq, 100.0 + seq) for seq in range(1, 51)], max_segment_bytes=1024)
+    log = EventLog(str(tmp_path), max_segment_bytes=1024)
+    log.open()
+    try:
+        assert log.stats()["segments"] > 1
+        assert log.next_seq == 51
+        assert read_all(log, limit=7) == list(range(1, 51))
+    finally:
+        log.close()
+
+
+def test_reopen_truncates_torn_tail(tmp_path):
+    write_log(str(tmp_path), [make_event(seq, 100.0 + seq) for seq in range(1, 6)])
+    (name,) = os.listdir(tmp_path)
+    path = os.path.join(tmp_path, name)
+    with open(path, "ab") as f:
+        f.write(encode_event(make_event(6, 106.0))[:RECORD_HEADER.size + 2])
+
+    log = EventLog(str(tmp_path))
+    log.open()
+    try:
+        assert log.next_seq == 6
+        assert read_all(log) == [1, 2, 3, 4, 5]
+        log.append(make_event(6, 106.0))
+    finally:
+        log.close()
+    log = EventLog(str(tmp_path))
+    log.open()
+    try:
+        assert read_all(log) == [1, 2, 3, 4, 5, 6]
+    finally:
+        log.close()
+
+
+def test_range_query_keeps_out_of_order_events(tmp_path):
+    # seq 3 was logged after seq 2 but is older; seq 9 is older than the whole range
+    timestamps = [10.0, 11.0, 10.5, 12.0, 12.0, 12.0, 12.0, 13.0, 9.9, 14.0]
+    events = [make_event(seq, timestamp) for seq, timestamp in enumerate(timestamps, 1)]
+    write_log(str(tmp_path), events, index_interval=2)
+    log = EventLog(str(tmp_path), index_interval=2)
+    log.open()
+    try:
+        assert read_all(log, start=10.5, end=13.0) == [2, 3, 4, 5, 6, 7, 8]
+        assert read_all(log, start=10.5, end=13.0, limit=1) == [2, 3, 4, 5, 6, 7, 8]
+    finally:
+        log.close()
+
+
+def test_pages_do_not_repeat_events_sharing_a_timestamp(tmp_path):
+    write_log(str(tmp_path), [make_event(seq, 50.0) for seq in range(1, 11)], max_segment_bytes=256)
+    log = EventLog(str(tmp_path), max_segment_bytes=256)
+    log.open()
+    try:
+        first = log.query(start=50.0, limit=4)
+        assert [event["seq"] for event in first["events"]] == [1, 2, 3, 4]
+        assert first["has_more"]
+        assert read_all(log, start=50.0, limit=3) == list(range(1, 11))
+    finally:
+        log.close()
+
+
+def test_event_type_filter_and_bad_cursor(tmp_path):
+    events = [make_event(seq, float(seq), "WARNING" if seq % 3 == 0 else "STATUS") for seq in range(1, 13)]
+    write_log(str(tmp_path), events)
+    log = EventLog(str(tmp_path))
+    log.open()
+    try:
+        assert read_all(log, event_type="WARNING", limit=2) == [3, 6, 9, 12]
+        with pytest.raises(ValueError):
+            log.query(cursor="nonsense")
+    finally:
+        log.close()
@@ -0,0 +1,31 @@
+import time
+
+from rover_sensors import SensorSampler
+
+
+def test_filtered_is_median_of_recent_valid_readings():
+    values = iter([30.0, -1.0, 10.0, 20.0, 99.0])
+    sampler = SensorSampler(lambda: next(values), interval=60, median_window=3)
+    for _ in range(4):
+        sampler._sample()
+    # The last three readings are -1, 10 and 20; the error code is ignored
+    assert sampler.filtered() == 15.0
+
+
+def test_filtered_drops_stale_readings_when_reads_fail():
+    readings = [25.0]
+
+    def read():
+        if not readings:
+            raise OSError("no echo")
+        return readings.pop()
+
+    sampler = SensorSampler(read, interval=0.01, max_age=0.05)
+    sampler.start()
+    try:
+        assert sampler.filtered() == 25.0
+        time.sleep(0.2)
+        assert sampler.errors > 0
+        assert sampler.filtered() is None
+    finally:
+        sampler.stop()
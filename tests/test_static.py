@@ -0,0 +1,59 @@
+from rover_static import accepted_encodings, etag_matches
+
+
+def test_accepted_encodings_honours_quality():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=0, gzip;q=0.5") == {"gzip"}
+    assert accepted_encodings("GZIP ; q=1.0") == {"gzip"}
+    assert accepted_encodings("gzip;q=bogus") == set()
+    assert accepted_encodings("") == set()
+
+
+def test_accepted_encodings_wildcard():
+    assert accepted_encodings("*") == {"br", "gzip"}
+    assert accepted_encodings("*;q=0") == set()
+
+
+def test_etag_matches_uses_weak_comparison():
+    etag = '"abc123-gz"'
+    assert etag_matches('"abc123-gz"', etag)
+    assert etag_matches('W/"abc123-gz"', etag)
+    assert etag_matches('"other", "abc123-gz"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abc123"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+def test_serves_precompressed_assets_with_validators(tmp_path, monkeypatch):
+    from starlette.applications import Starlette
+    from starlette.routing import Mount
+    from starlette.testclient import TestClient
+
+    import rover_static
+
+    (tmp_path / "app.css").write_text("body { color: red; }\n" * 200)
+    static_files = rover_static.PrecompressedStaticFiles(str(tmp_path), cache_dir=None)
+    static_files.warm_up()
+    # Queued after the compression job on the single worker, so it returns once gzip is ready
+    static_files._compressor.submit(lambda: None).result(5)
+    client = TestClient(Starlette(routes=[Mount("/static", static_files)]))
+    try:
+        response = client.get("/static/app.css", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["cache-control"] == rover_static.REVALIDATE_CACHE_CONTROL
+        etag = response.headers["etag"]
+        assert client.get("/static/app.css", headers={"Accept-Encoding": "gzip", "If-None-Match": etag}).status_code == 304
+
+        versioned = client.get(static_files.url("app.css"))
+        assert versioned.headers["cache-control"] == rover_static.IMMUTABLE_CACHE_CONTROL
+        assert client.get("/static/missing.js").status_code == 404
+
+        # A changed file is picked up by the background check on a later request
+        monkeypatch.setattr(rover_static, "RECHECK_INTERVAL", 0)
+        (tmp_path / "app.css").write_text("p {}\n")
+        client.get("/static/app.css")
+        static_files._compressor.submit(lambda: None).result(5)
+        assert client.get("/static/app.css").text == "p {}\n"
+    finally:
+        static_files.close()